@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*-coding: utf-8-*-
+
+"""Feature statistics of the positions of a game archive, by phase"""
+
+from __future__ import (division, absolute_import, unicode_literals,
+                        print_function)
+
+import argparse
+import time
+
+from pyfics.archive import Archive
+from pyfics import features
+
+
+def main():
+    """Print the report"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("archive", help="archive file")
+    parser.add_argument("--games", type=int, default=None,
+                        help="only use the first games")
+    args = parser.parse_args()
+
+    archive = Archive(args.archive)
+    start = time.time()
+    codes, _games, _plies = features.archive_boards(
+        archive, range(min(len(archive), args.games or len(archive))))
+    replayed = time.time() - start
+    start = time.time()
+    values = features.features(codes)
+    computed = time.time() - start
+    print("{0} positions: replayed in {1:.1f} s, features in {2:.1f} s".format(
+        len(codes), replayed, computed))
+
+    print("{0:12} {1:>9} {2:>9} {3:>9} {4:>9} {5:>9}".format(
+        "phase", "positions", "material", "psq", "white mob", "black mob"))
+    for label, name in enumerate(features.PHASES):
+        rows = values["label"] == label
+        if not rows.any():
+            continue
+        print("{0:12} {1:9d} {2:9.2f} {3:9.1f} {4:9.1f} {5:9.1f}".format(
+            name, rows.sum(), values["material"][rows].mean(),
+            values["piece_square"][rows].mean(),
+            values["mobility"][rows, 0].mean(),
+            values["mobility"][rows, 1].mean()))
+
+if __name__ == "__main__":
+    main()
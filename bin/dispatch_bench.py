@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*-coding: utf-8-*-
+
+"""Benchmark of dispatching fics messages, checked against the former chain
+
+    the messages are those of a recorded session (the fics output as
+    received, split into messages) or of a generated session."""
+
+from __future__ import (division, absolute_import, unicode_literals,
+                        print_function)
+
+import re
+import argparse
+import collections
+import random
+import timeit
+
+from pyfics import config
+from pyfics.game import Position
+from pyfics.timeseal import Timeseal
+from pyfics.dispatch import Dispatcher, FICS_MESSAGES
+
+
+def legacy_dispatch(data):
+    """The former chain of Player.parse_fics, return the handler name"""
+    # pylint: disable=R0911,R0912
+    if re.match("login:", data):
+        return "login"
+    elif re.match("password:", data):
+        return "password"
+    elif re.match(".*Starting FICS session", data):
+        return "session"
+    elif re.match(r"\W*Logging you out|\*\*\*\* Auto-logout", data):
+        return "logout"
+    elif re.match("(<12>.*)", data, re.DOTALL):
+        return "style12"
+    elif re.match(
+            r"{Game (?P<game_no>\d+) \((?P<players>.*)\)" +
+            " (?P<action>.+)} (?P<result>.+)", data):
+        return "result"
+    elif re.match("You are no longer examining game" +
+                  " (?P<game_no>.*)", data):
+        return "unexamine"
+    elif re.match("(?P<opponent>.*) accepts your seek.", data):
+        return "ignore"
+    elif re.match("Your seek matches", data):
+        return "ignore"
+    elif re.match("Your seek intercepts .*'s getgame.", data):
+        return "ignore"
+    elif re.match("Your opponent has aborted the game", data):
+        return "ignore"
+    elif re.match("Checking if really out of time", data):
+        return "info"
+    elif re.match("Opponent is not out of time, priming autoflag", data):
+        return "info"
+    elif re.match(r"Game (?P<game_no>\d*): (?P<opponent>.*)" +
+                  " moves: (?P<move>.*)", data):
+        return "ignore"
+    elif re.match(r"Game (?P<game_no>\d*): (?P<message>.*)", data):
+        return "game_info"
+    elif re.match(
+            r"Creating: (?P<white>.*) (?P<white_rating>\(.*\))" +
+            r"(?P<black>.*) (?P<black_rating>\(.*\))" +
+            "(?P<timing>.*)\n" +
+            r"{Game (?P<game_no>\d)* .*}", data):
+        return "creating"
+    elif re.match(r"Starting a game in examine \(scratch\) mode", data):
+        return "examine"
+    elif re.match("Illegal move", data):
+        return "info"
+    return "display"
+
+
+# the handlers of Player, the other messages are displayed
+HANDLERS = ("login", "password", "session", "logout", "style12", "result",
+            "unexamine", "ignore", "info", "game_info", "creating",
+            "examine")
+# messages matching a pattern without a prefix and a later pattern with
+# one: the former chain took the first, the Dispatcher takes the second
+# (the logout pattern cannot match a message with a prefix)
+PRECEDENCE = (
+    ("Game 42: GuestABCD accepts your seek.", "ignore", "game_info"),
+    ("Game 42: Starting FICS session", "session", "game_info"))
+
+
+def get_dispatcher():
+    """A Dispatcher of FICS_MESSAGES, whose handlers return their name"""
+    handlers = {name: (lambda name: lambda _data, _match: name)(name)
+                for name in HANDLERS}
+    return Dispatcher.from_table(FICS_MESSAGES, handlers,
+                                 lambda _data, _match: "display")
+
+
+def check_precedence(dispatcher):
+    """The patterns without a prefix come after those with a prefix"""
+    for message, legacy, name in PRECEDENCE:
+        if (legacy_dispatch(message), dispatcher.dispatch(message)) != (
+                legacy, name):
+            raise SystemExit("Unexpected handler of {0}".format(message))
+
+
+def get_session(games, seed):
+    """The messages of a generated session: games of random moves, with
+        the chat, seeks and notifications between the moves"""
+    rand = random.Random(seed)
+    messages = ["login:", "password:",
+                "**** Starting FICS session as GuestXYZW(U) ****"]
+    chatter = [
+        "GuestABCD(U)(53): anyone for a game?",
+        "Your seek has been posted with index 12.",
+        "Notification: Someone has arrived.",
+        "Game notification: A (1500) vs. B (1600) blitz 3 0: Game 5",
+        "GuestABCD accepts your seek.",
+        "Illegal move (e2e5).",
+        "Game 42: GuestABCD requests to abort the game."]
+    for number in range(games):
+        messages.append(
+            "Creating: GuestXYZW (++++) GuestABCD (++++) unrated blitz 3 0"
+            "\n{{Game {0} (GuestXYZW vs. GuestABCD) Creating unrated "
+            "blitz match.}}".format(number))
+        position = Position(config.START)
+        for _ply in range(rand.randrange(40, 120)):
+            moves = list(position.legal_moves())
+            if not moves:
+                break
+            position.make_move(rand.choice(moves))
+            fields = position.get_style12().split(" ")
+            fields[16] = str(number)
+            messages.append(" ".join(fields))
+            if rand.random() < 0.2:
+                messages.append(rand.choice(chatter))
+        messages.append(
+            "{{Game {0} (GuestXYZW vs. GuestABCD) GuestABCD resigns}} "
+            "1-0".format(number))
+    messages.append("Logging you out.")
+    return messages
+
+
+def read_session(filename):
+    """The messages of a recorded session, like tests/data/session.fics"""
+    with open(filename, "rb") as fobj:
+        data = fobj.read()
+    # the lines up to the start of the session are received on their own
+    start = data.find(b"\n", data.find(b"Starting FICS session")) + 1
+    timeseal = Timeseal()
+    messages = []
+    for chunk in (data[:start], data[start:] + b"\n\n"):
+        timeseal.receive(chunk)
+        messages.extend(timeseal.get_messages())
+    return [message for message in messages if message]
+
+
+def main():
+    """Time both dispatchers"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--session",
+                        help="recorded fics output, instead of a generated "
+                        "session")
+    parser.add_argument("--games", type=int, default=20,
+                        help="number of games of the generated session")
+    parser.add_argument("--repeat", type=int, default=20,
+                        help="number of passes over the session")
+    args = parser.parse_args()
+
+    messages = (read_session(args.session) if args.session else
+                get_session(args.games, 25))
+    dispatcher = get_dispatcher()
+    check_precedence(dispatcher)
+    names = [dispatcher.dispatch(message) for message in messages]
+    if names != [legacy_dispatch(message) for message in messages]:
+        raise SystemExit("The dispatchers differ")
+    print("{0} messages: {1}".format(len(messages), ", ".join(
+        "{0} {1}".format(name, count)
+        for name, count in collections.Counter(names).most_common())))
+
+    count = len(messages) * args.repeat
+    for name, dispatch in (("legacy chain", legacy_dispatch),
+                           ("Dispatcher", dispatcher.dispatch)):
+        seconds = min(timeit.repeat(
+            lambda: [dispatch(message) for message in messages],
+            number=args.repeat, repeat=3))
+        print("{name:12}: {rate:9.0f} messages/s ({usec:.1f} usec/message)"
+              .format(name=name, rate=count / seconds,
+                      usec=1e6 * seconds / count))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*-coding: utf-8-*-
+
+"""Observe many fics games from several guest sessions, save them to the
+    pgn file and the archive and report the counters"""
+
+from __future__ import (division, absolute_import, unicode_literals,
+                        print_function)
+
+import argparse
+import asyncio
+import logging
+import signal
+
+from pyfics.manager import Manager, MAX_PLIES
+
+
+async def report(manager, interval):
+    """Print the counters every interval seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        print(" ".join("{0}={1:.0f}".format(name, value) for name, value in
+                       sorted(manager.get_stats().items())))
+
+
+async def run(manager, interval):
+    """Run the manager, with a report, until ctrl-c"""
+    loop = asyncio.get_event_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, manager.close)
+    reporter = asyncio.ensure_future(report(manager, interval))
+    try:
+        await manager.run()
+    finally:
+        reporter.cancel()
+    print(manager.get_stats())
+
+
+def main():
+    """Observe the games"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=4,
+                        help="number of guest logins")
+    parser.add_argument("--observe", type=int, nargs="*", default=[],
+                        help="game numbers, spread over the sessions")
+    parser.add_argument("--command", action="append", default=[],
+                        help="fics command of every session after login")
+    parser.add_argument("--max-plies", type=int, default=MAX_PLIES,
+                        help="halfmoves kept of every game")
+    parser.add_argument("--interval", type=float, default=10,
+                        help="seconds between reports")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    manager = Manager(args.sessions, args.observe, args.command,
+                      args.max_plies)
+    asyncio.run(run(manager, args.interval))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*-coding: utf-8-*-
+
+"""Perft: count and time the legal move tree of pyfics.game.Position"""
+
+from __future__ import (division, absolute_import, unicode_literals,
+                        print_function)
+
+import argparse
+import time
+
+from pyfics import config
+from pyfics.game import Position, fen_to_style12, perft
+
+# name, style12, nodes at depth 1..5
+POSITIONS = [
+    ("start", config.START,
+     [20, 400, 8902, 197281, 4865609]),
+    ("kiwipete", fen_to_style12(
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq -"),
+     [48, 2039, 97862, 4085603, 193690690]),
+    ("endgame", fen_to_style12("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - -"),
+     [14, 191, 2812, 43238, 674624]),
+    ("promotions", fen_to_style12(
+        "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq -"),
+     [6, 264, 9467, 422333, 15833292]),
+    ("talkchess", fen_to_style12(
+        "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8"),
+     [44, 1486, 62379, 2103487, 89941194]),
+]
+
+
+def main():
+    """Run perft on the test positions"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--depth", type=int, default=5,
+                        help="maximum depth (1..5)")
+    parser.add_argument("--max-nodes", type=int, default=5000000,
+                        help="skip depths with more nodes than this")
+    args = parser.parse_args()
+
+    failed = False
+    for name, style12, expected in POSITIONS:
+        position = Position(style12)
+        for depth in range(1, args.depth + 1):
+            if expected[depth - 1] > args.max_nodes:
+                break
+            start = time.time()
+            nodes = perft(position, depth)
+            seconds = time.time() - start
+            failed = failed or nodes != expected[depth - 1]
+            print(("{name:10} depth {depth}: {nodes:9d} nodes" +
+                   " {nps:8.0f} nodes/s {status}").format(
+                       name=name, depth=depth, nodes=nodes,
+                       nps=nodes / seconds if seconds > 0 else 0,
+                       status="ok" if nodes == expected[depth - 1] else
+                       "FAIL (expected {0})".format(expected[depth - 1])))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*-coding: utf-8-*-
+
+"""Append the games of pgn files to a binary game archive
+    and update its position index and opening tree"""
+
+from __future__ import (division, absolute_import, unicode_literals,
+                        print_function)
+
+import argparse
+import logging
+import os
+import time
+
+from pyfics.archive import Archive
+from pyfics.pgn import read_games
+from pyfics.positions import PositionIndex
+from pyfics.explorer import Explorer
+
+
+def main():
+    """Convert the pgn files"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("archive", help="archive file")
+    parser.add_argument("pgn", nargs="+", help="pgn files")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    archive = Archive(args.archive)
+    for filename in args.pgn:
+        start = time.time()
+        count = archive.extend(read_games(filename))
+        seconds = time.time() - start
+        print("{name}: {count} games, {rate:.0f} games/s".format(
+            name=filename, count=count,
+            rate=count / seconds if seconds > 0 else 0))
+    start = time.time()
+    count = PositionIndex(archive).update()
+    print("indexed {0} games in {1:.1f} s".format(count, time.time() - start))
+    start = time.time()
+    count = Explorer(archive).update()
+    print("added {0} games to the opening tree in {1:.1f} s".format(
+        count, time.time() - start))
+    print("{0}: {1} games, {2} bytes".format(
+        args.archive, len(archive),
+        os.path.getsize(args.archive) + os.path.getsize(
+            archive.index_filename)))
+
+if __name__ == "__main__":
+    main()
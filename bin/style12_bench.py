@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*-coding: utf-8-*-
+
+"""Micro-benchmark of parsing style12 lines into a Position"""
+
+from __future__ import (division, absolute_import, unicode_literals,
+                        print_function)
+
+import argparse
+import random
+import timeit
+
+from pyfics import config
+from pyfics.game import Position
+
+
+def legacy_parse(style12):
+    """The former parser: a props dict and int() tried on every field"""
+    props = {}
+    for name, val in zip(config.STYLE12, style12.split(" ")):
+        try:
+            val = int(val)
+        except ValueError:
+            pass
+        props[name] = val
+    board = {
+        "{0}{1}".format(coord, number): symbol
+        for number in range(1, 9)
+        for coord, symbol in zip("abcdefgh", props[number])
+        if symbol != "-"}
+    return props, board
+
+
+def get_lines(plies, seed):
+    """Style12 lines of a random game"""
+    rand = random.Random(seed)
+    position = Position(config.START)
+    lines = [position.get_style12()]
+    for _ply in range(plies):
+        moves = list(position.legal_moves())
+        if not moves:
+            break
+        position.make_move(rand.choice(moves))
+        lines.append(position.get_style12())
+    return lines
+
+
+def main():
+    """Time both parsers"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--plies", type=int, default=120,
+                        help="length of the random game")
+    parser.add_argument("--repeat", type=int, default=50,
+                        help="number of passes over the game")
+    args = parser.parse_args()
+
+    lines = get_lines(args.plies, 12)
+    count = len(lines) * args.repeat
+    for name, parse in (("legacy dict", legacy_parse),
+                        ("Position", Position)):
+        seconds = min(timeit.repeat(
+            lambda: [parse(line) for line in lines],
+            number=args.repeat, repeat=3))
+        print("{name:12}: {rate:9.0f} lines/s ({usec:.1f} usec/line)".format(
+            name=name, rate=count / seconds, usec=1e6 * seconds / count))
+
+if __name__ == "__main__":
+    main()
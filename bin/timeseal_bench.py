@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*-coding: utf-8-*-
+
+"""Micro-benchmark of the timeseal encoder, checked against the former one"""
+
+from __future__ import (division, absolute_import, unicode_literals,
+                        print_function)
+
+import argparse
+import random
+import timeit
+
+from pyfics.timeseal import Timeseal
+
+ENCODE = list(bytearray(Timeseal.ENCODE))
+
+
+def legacy_encode(text, timestamp, filler, offset):
+    """The former encoder: a list of ints swapped and xor-ed one by one"""
+    enc = "{0}\x18{1:d}\x19".format(text, timestamp)
+    enc += filler
+
+    buf = [ord(i) for i in enc]
+
+    for i in range(0, len(buf), 12):
+        buf[i + 11], buf[i] = buf[i], buf[i + 11]
+        buf[i + 9], buf[i + 2] = buf[i + 2], buf[i + 9]
+        buf[i + 7], buf[i + 4] = buf[i + 4], buf[i + 7]
+
+    for i in range(len(buf)):
+        buf[i] |= 0x80
+        j = (i + offset) % len(ENCODE)
+        buf[i] = chr((buf[i] ^ ENCODE[j]) - 32)
+
+    buf.append(chr(0x80 | offset))
+    return "".join(buf).encode("iso8859")
+
+
+def get_commands(count, seed):
+    """Random commands with the timestamp, filler and offset to encode them"""
+    rand = random.Random(seed)
+    commands = []
+    for _number in range(count):
+        text = "".join(rand.choice(Timeseal.FILLER + " -+")
+                       for _char in range(rand.randrange(1, 200)))
+        timestamp = rand.randrange(10 ** 7)
+        length = len("{0}\x18{1:d}\x19".format(text, timestamp))
+        filler = "".join(rand.sample(Timeseal.FILLER, 12 - length % 12))
+        commands.append((text, timestamp, filler,
+                         rand.randrange(Timeseal.ENCODELEN)))
+    return commands
+
+
+def main():
+    """Check that both encoders agree and time them"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--commands", type=int, default=1000,
+                        help="number of random commands")
+    parser.add_argument("--repeat", type=int, default=20,
+                        help="number of passes over the commands")
+    args = parser.parse_args()
+
+    commands = get_commands(args.commands, 17)
+    timeseal = Timeseal()
+    for command in commands:
+        if timeseal.encode(*command) != legacy_encode(*command):
+            raise SystemExit("Encoders differ for {0!r}".format(command))
+
+    count = len(commands) * args.repeat
+    for name, encode in (("legacy", legacy_encode),
+                         ("bytes", timeseal.encode)):
+        seconds = min(timeit.repeat(
+            lambda: [encode(*command) for command in commands],
+            number=args.repeat, repeat=3))
+        print("{name:8}: {rate:9.0f} commands/s ({usec:.1f} usec/cmd)".format(
+            name=name, rate=count / seconds, usec=1e6 * seconds / count))
+
+if __name__ == "__main__":
+    main()
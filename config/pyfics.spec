@@ -15,6 +15,7 @@
     guest_init = string_list(default=list("-ch 4", "-ch 53", "set seek 0", "set formula lightning | blitz"))
     server = string(default="freechess.org")
     port = integer(default=23)
+    read_size = integer(min=1024, default=65536)
 
 [menu]
     Seek = string_list(default=list("Seek 1 0 f", "Seek 1 1 f", "Seek 3 0 f", "sought", "Unsought"))
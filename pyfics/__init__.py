@@ -1,25 +1,46 @@
 #!/usr/bin/env python
 # -*-coding: utf-8-*-
 
-"""Main pyfics module"""
+"""Main pyfics module
+
+    the classes are imported on first use (PEP 562), so headless code
+    like the daemon does not import gtk"""
 
 from __future__ import (division, absolute_import, unicode_literals,
                         print_function)
 
-from gi.repository import GObject
-
-from .board import Board, Clock
-from .interface import Interface
-from .moves import MovesTab
-from .game import Game, Position
-from .player import Player
-from .stockfish import Stockfish
-from .fics import Fics
-from . import config
+import importlib
 
 VERSION = "0.1"
 DESCRIPTION = "Play Chess on Freechess.org (FICS)"
 AUTHOR = "Sander van Noort"
 EMAIL = "Sander.van.Noort@gmail.com"
 
-# GObject.threads_init()
+# the module of every exported name
+_EXPORTS = {
+    "Board": "board",
+    "Clock": "board",
+    "Interface": "interface",
+    "MovesTab": "moves",
+    "Game": "game",
+    "Position": "game",
+    "Player": "player",
+    "Stockfish": "stockfish",
+    "Engine": "engine",
+    "Fics": "fics",
+    "FicsClient": "client",
+    "Daemon": "daemon",
+    "config": "config"}
+
+
+def __getattr__(name):
+    """Import an exported name when it is first used"""
+    if name not in _EXPORTS:
+        raise AttributeError("module {0!r} has no attribute {1!r}".format(
+            __name__, name))
+    module = importlib.import_module("." + _EXPORTS[name], __name__)
+    return module if name == _EXPORTS[name] else getattr(module, name)
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_EXPORTS))
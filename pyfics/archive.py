@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*-coding: utf-8-*-
+
+"""Compact binary archive of games
+
+    every game is a fixed-width header, the start position when it is
+    not the normal one, and two bytes per move: the start and end index
+    and the promotion piece, so a game is replayed without generating
+    moves. A second file holds the offset of every game, so game number N
+    is read through mmap without looking at the other games."""
+
+from __future__ import (division, absolute_import, unicode_literals,
+                        print_function)
+
+import io
+import os
+import mmap
+import struct
+import logging
+
+from .game import Game, Position, fen_to_style12
+from .exceptions import PyficsError
+from . import config
+
+logger = logging.getLogger(__name__)
+
+# white, black, white elo, black elo, result, date (yyyymmdd),
+# initial time and increment (seconds), number of moves, length of fen
+HEADER = struct.Struct("<17s17sHHBIHHHH")
+OFFSET = struct.Struct("<Q")
+RESULTS = ("*", "1-0", "0-1", "1/2-1/2")
+PROMOTIONS = (None, "N", "B", "R", "Q")
+START_KEY = Position(config.START).key
+
+
+def _to_int(value, default=0):
+    """Integer value of a pgn tag"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _clamp(value, top=0xffff):
+    """Value within the range of an unsigned field"""
+    return max(0, min(value, top))
+
+
+def encode_header(tags, moves, fen=None):
+    """Pack the pgn tags of a game"""
+    date = "".join(tags.get("Date", "").split("."))
+    initial, _sep, increment = tags.get("TimeControl", "").partition("+")
+    fen = b"" if fen is None else fen.encode("ascii")
+    return HEADER.pack(
+        tags.get("White", "").encode("utf-8")[:17],
+        tags.get("Black", "").encode("utf-8")[:17],
+        _clamp(_to_int(tags.get("WhiteElo"))),
+        _clamp(_to_int(tags.get("BlackElo"))),
+        RESULTS.index(tags["Result"]) if tags.get("Result") in RESULTS else 0,
+        _clamp(_to_int(date), 0xffffffff), _clamp(_to_int(initial)),
+        _clamp(_to_int(increment)), moves, len(fen)) + fen
+
+
+def decode_header(data, offset=0):
+    """Unpack a header into a dict"""
+    (white, black, white_elo, black_elo, result, date, initial, increment,
+     moves, fen_length) = HEADER.unpack_from(data, offset)
+    offset += HEADER.size
+    return {
+        "White": white.rstrip(b"\0").decode("utf-8", "replace"),
+        "Black": black.rstrip(b"\0").decode("utf-8", "replace"),
+        "WhiteElo": white_elo,
+        "BlackElo": black_elo,
+        "Result": RESULTS[result],
+        "Date": date,
+        "TimeControl": (initial, increment),
+        "moves": moves,
+        "FEN": (bytes(data[offset:offset + fen_length]).decode("ascii")
+                if fen_length else None),
+        "offset": offset + fen_length}
+
+
+def encode_move(move):
+    """Code a move as start + 64 * end + 4096 * promotion"""
+    promotion = move.promotion
+    return move.start | move.end << 6 | PROMOTIONS.index(
+        None if promotion is None else promotion.upper()) << 12
+
+
+def decode_code(code):
+    """Decode a move code into (start, end, promotion letter)"""
+    return code & 63, code >> 6 & 63, PROMOTIONS[code >> 12]
+
+
+def encode_moves(moves):
+    """Pack moves as codes"""
+    return struct.pack("<{0}H".format(len(moves)),
+                       *[encode_move(move) for move in moves])
+
+
+def decode_moves(data, offset, count):
+    """Unpack moves into (start, end, promotion letter)"""
+    return [decode_code(code)
+            for code in struct.unpack_from("<{0}H".format(count),
+                                           data, offset)]
+
+
+def decode_move(position, code):
+    """The move of position for a decoded (start, end, promotion)"""
+    start, end, promotion = code
+    if promotion is not None and position.next_color == "B":
+        promotion = promotion.lower()
+    return position.create_move(start, end, promotion)
+
+
+class Archive(object):
+    """A file of games with an offset index next to it"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.index_filename = filename + ".idx"
+        self._data = self._index = None
+
+    def close(self):
+        """Release the memory maps"""
+        for data in (self._data, self._index):
+            if data is not None:
+                data.close()
+        self._data = self._index = None
+
+    @staticmethod
+    def _map(filename):
+        """Memory map a file for reading, None when it is empty"""
+        if not os.path.exists(filename) or os.path.getsize(filename) == 0:
+            return None
+        with io.open(filename, "rb") as data_file:
+            return mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _open(self):
+        """Map the archive, after it was changed"""
+        if self._index is None:
+            self._data = self._map(self.filename)
+            self._index = self._map(self.index_filename)
+
+    def __len__(self):
+        self._open()
+        return 0 if self._index is None else len(self._index) // OFFSET.size
+
+    def extend(self, games):
+        """Append games, return the number of games added"""
+        self.close()
+        count = 0
+        with io.open(self.filename, "ab") as data_file, \
+                io.open(self.index_filename, "ab") as index_file:
+            data_file.seek(0, os.SEEK_END)
+            for game in games:
+                position = game.get_history(game.first)
+                fen = (None if game.first == 0 and position.key == START_KEY
+                       else position.get_fen())
+                moves = [ply[0] for ply in game.history[1:]]
+                if None in moves:
+                    logger.warning("Game cut at an unknown move")
+                    moves = moves[:moves.index(None)]
+                # a game that cannot be packed leaves no index entry
+                data = (encode_header(game.tags, len(moves), fen) +
+                        encode_moves(moves))
+                index_file.write(OFFSET.pack(data_file.tell()))
+                data_file.write(data)
+                count += 1
+        return count
+
+    def append(self, game):
+        """Append a game"""
+        return self.extend([game])
+
+    def _offset(self, number):
+        """Offset of game number in the data file"""
+        self._open()
+        if not 0 <= number < len(self):
+            raise PyficsError("No game {0} in {1}".format(
+                number, self.filename))
+        return OFFSET.unpack_from(self._index, number * OFFSET.size)[0]
+
+    def get_header(self, number):
+        """The header of game number, as a dict"""
+        offset = self._offset(number)
+        return decode_header(self._data, offset)
+
+    def get_moves(self, number):
+        """The header and the decoded moves of game number"""
+        header = self.get_header(number)
+        return header, decode_moves(
+            self._data, header["offset"], header["moves"])
+
+    def replay(self, number):
+        """Yield every position of game number with the move played in it
+            (None after the last move); the position object is reused"""
+        header, codes = self.get_moves(number)
+        position = Position(
+            config.START if header["FEN"] is None else
+            fen_to_style12(header["FEN"]))
+        for code in codes:
+            move = decode_move(position, code)
+            yield position, move
+            position.make_move(move)
+        yield position, None
+
+    def get_game(self, number):
+        """Game number as a Game"""
+        header, codes = self.get_moves(number)
+        game = Game()
+        if header["FEN"] is not None:
+            game.setup(fen_to_style12(header["FEN"]))
+            game.tags["SetUp"] = "1"
+            game.tags["FEN"] = header["FEN"]
+        for code in codes:
+            game.make_move(decode_move(game.position, code))
+
+        for name in ("White", "Black", "Result"):
+            game.tags[name] = header[name]
+        for name in ("WhiteElo", "BlackElo"):
+            if header[name]:
+                game.tags[name] = "{0}".format(header[name])
+        if header["Date"]:
+            date = "{0:08d}".format(header["Date"])
+            game.tags["Date"] = "{0}.{1}.{2}".format(
+                date[:4], date[4:6], date[6:])
+        if any(header["TimeControl"]):
+            game.tags["TimeControl"] = "{0}+{1}".format(
+                *header["TimeControl"])
+        return game
+
+    def headers(self):
+        """Yield the headers of all games"""
+        for number in range(len(self)):
+            yield self.get_header(number)
@@ -19,6 +19,7 @@ import collections
 import logging
 
 from . import config
+from .game import SQUARES
 
 logger = logging.getLogger(__name__)
 
@@ -368,39 +369,40 @@ class Board(Gtk.Layout):
     def make_move(self, move):
         """Move a piece on the board"""
 
-        piece = self.pieces[move["squares"][0]]
-        self.moves["last"] = list(move["squares"])
-        if "squares2" in move:
-            self.moves["last"].extend(move["squares2"])
-        xval, yval = self.square_to_xy(move["squares"][1])
-        self.remove_drag(move["squares"][0])
+        start, end = move.squares
+        piece = self.pieces[start]
+        self.moves["last"] = list(move.squares)
+        if move.rook is not None:
+            self.moves["last"].extend(SQUARES[index] for index in move.rook)
+        xval, yval = self.square_to_xy(end)
+        self.remove_drag(start)
         self.move(piece, xval, yval)
-        if move["squares"][1] in self.pieces:
-            taken_piece = self.pieces[move["squares"][1]]
-            self.remove_drag(move["squares"][1])
+        if end in self.pieces:
+            taken_piece = self.pieces[end]
+            self.remove_drag(end)
             taken_piece.destroy()
-        self.pieces[move["squares"][1]] = piece
-        del self.pieces[move["squares"][0]]
-
-        if "enpassant" in move:
-            # the 3rd place is en passant
-            piece = self.pieces[move["enpassant"]]
-            self.remove_drag(move["enpassant"])
-            del self.pieces[move["enpassant"]]
+        self.pieces[end] = piece
+        del self.pieces[start]
+
+        if move.enpassant is not None:
+            enpassant = SQUARES[move.enpassant]
+            piece = self.pieces[enpassant]
+            self.remove_drag(enpassant)
+            del self.pieces[enpassant]
             piece.destroy()
-        if "promotion" in move:
-            # the 3rd place is promotion piece
+        if move.promotion is not None:
             piece.destroy()
-            piece = self.create_piece(move["promotion"])
-            self.pieces[move["squares"][1]] = piece
+            piece = self.create_piece(move.promotion)
+            self.pieces[end] = piece
             self.put(piece, xval, yval)
-        elif "squares2" in move:
-            piece = self.pieces[move["squares2"][0]]
-            self.remove_drag(move["squares2"][0])
-            xval, yval = self.square_to_xy(move["squares2"][1])
+        elif move.rook is not None:
+            rook_start, rook_end = [SQUARES[index] for index in move.rook]
+            piece = self.pieces[rook_start]
+            self.remove_drag(rook_start)
+            xval, yval = self.square_to_xy(rook_end)
             self.move(piece, xval, yval)
-            self.pieces[move["squares2"][1]] = piece
-            del self.pieces[move["squares2"][0]]
+            self.pieces[rook_end] = piece
+            del self.pieces[rook_start]
         self.queue_draw()  # after piece moving, redraw
 
     def xy_to_square(self, xval, yval):
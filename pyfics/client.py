@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*-coding: utf-8-*-
+
+"""Asyncio client of fics, without GObject
+
+    FicsProtocol runs the Timeseal protocol on an asyncio transport,
+    which reads into one preallocated buffer, and queues the received
+    messages; FicsClient connects it and gives the messages as an async
+    iterator, so bots, observers and load tests run many connections in
+    one event loop."""
+
+from __future__ import (division, absolute_import, unicode_literals,
+                        print_function)
+
+import asyncio
+import logging
+
+from .timeseal import Timeseal
+
+logger = logging.getLogger(__name__)
+
+MAX_QUEUE = 1000  # messages queued before reading is paused
+
+
+class FicsProtocol(asyncio.BufferedProtocol):
+    """Timeseal on an asyncio transport"""
+
+    def __init__(self, read_size=Timeseal.BUFFER_SIZE, max_queue=MAX_QUEUE):
+        self.timeseal = Timeseal()
+        # the transport reads into this view, without a new object per read
+        self.chunk = memoryview(bytearray(read_size))
+        self.transport = None
+        self.max_queue = max_queue
+        self.messages = asyncio.Queue()  # None after the connection ends
+        self.reading = True
+        self.writable = asyncio.Event()
+        self.writable.set()
+        self.closed = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.transport.write(self.timeseal.start())
+
+    def get_buffer(self, _sizehint):
+        return self.chunk
+
+    def buffer_updated(self, nbytes):
+        reply = self.timeseal.receive(self.chunk[:nbytes].tobytes())
+        if reply:
+            self.transport.write(reply)
+        for message in self.timeseal.get_messages():
+            self.messages.put_nowait(message)
+        if self.messages.qsize() >= self.max_queue and self.reading:
+            self.reading = False
+            self.transport.pause_reading()
+
+    def connection_lost(self, exc):
+        if exc is not None:
+            logger.warning("Connection lost: {0}".format(exc))
+        self.closed = True
+        self.writable.set()
+        self.messages.put_nowait(None)
+
+    def pause_writing(self):
+        self.writable.clear()
+
+    def resume_writing(self):
+        self.writable.set()
+
+    def write(self, text):
+        """Send the complete lines of text"""
+        if self.closed:
+            return
+        data = self.timeseal.write(text)
+        if data:
+            self.transport.write(data)
+
+    async def get_message(self):
+        """The next message, None after the connection ended"""
+        message = await self.messages.get()
+        if (not self.reading and not self.closed and
+                self.messages.qsize() < self.max_queue // 2):
+            self.reading = True
+            self.transport.resume_reading()
+        return message
+
+
+class FicsClient(object):
+    """A connection to a fics server
+        iterate with async for over the messages, send commands with
+        send; the iteration ends when the connection is closed"""
+
+    def __init__(self, server="freechess.org", port=23,
+                 read_size=Timeseal.BUFFER_SIZE, max_queue=MAX_QUEUE):
+        self.server = server
+        self.port = port
+        self.read_size = read_size
+        self.max_queue = max_queue
+        self.protocol = None
+
+    async def connect(self):
+        """Open the connection"""
+        loop = asyncio.get_event_loop()
+        _transport, self.protocol = await loop.create_connection(
+            lambda: FicsProtocol(self.read_size, self.max_queue),
+            self.server, self.port)
+        logger.debug("Connected to {0}:{1}".format(self.server, self.port))
+        return self
+
+    @property
+    def connected(self):
+        """Whether the fics session started"""
+        return (self.protocol is not None and not self.protocol.closed and
+                self.protocol.timeseal.connected)
+
+    def write(self, command):
+        """Send a command without waiting"""
+        self.protocol.write(command + "\n")
+
+    async def send(self, command):
+        """Send a command, wait while the transport buffer is full"""
+        self.write(command)
+        await self.protocol.writable.wait()
+
+    def close(self):
+        """Close the connection"""
+        if self.protocol is not None and not self.protocol.closed:
+            self.protocol.transport.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self.protocol.get_message()
+        if message is None:
+            # keep ending the iteration
+            self.protocol.messages.put_nowait(None)
+            raise StopAsyncIteration
+        return message
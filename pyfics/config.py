@@ -20,6 +20,9 @@ ICON = os.path.join(DATA_DIR, "icons", "pyfics.svg")
 LOCAL_DIR = os.path.expanduser("~/.config/pyfics")
 if not os.path.exists(LOCAL_DIR):
     os.makedirs(LOCAL_DIR)
+PGN_FILE = os.path.join(LOCAL_DIR, "games.pgn")
+ARCHIVE_FILE = os.path.join(LOCAL_DIR, "games.arc")
+DAEMON_SOCKET = os.path.join(LOCAL_DIR, "daemon.sock")
 
 SETTINGS = configobj.ConfigObj(
     os.path.join(LOCAL_DIR, "settings.ini"),
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*-coding: utf-8-*-
+
+"""Headless fics client, without gtk
+
+    Daemon logs in with a FicsClient and follows the style12 positions
+    of every board in a GameRegistry; every finished game is written to
+    the pgn file and the archive, and with an Engine the positions are
+    analysed. A unix socket takes control commands, one per line:
+        status          the counters, as json
+        send <command>  send a command to fics
+        quit            log out and stop"""
+
+from __future__ import (division, absolute_import, unicode_literals,
+                        print_function)
+
+import os
+import json
+import signal
+import asyncio
+import logging
+import collections
+
+from .client import FicsClient
+from .dispatch import Dispatcher
+from .game import Game, Position
+from .registry import GameRegistry
+from .pgn import PgnWriter, fill_tags
+from .archive import Archive
+from .positions import PositionIndex
+from .explorer import Explorer
+from .exceptions import PyficsError
+from . import config
+
+logger = logging.getLogger(__name__)
+
+STOCKTIME = 1000  # milliseconds of analysis per position
+
+
+class Daemon(object):
+    """Follow fics games without a display"""
+    # (too many instance attributes) pylint: disable=R0902
+
+    def __init__(self, user="guest", password="", commands=(),
+                 engine=None, stocktime=STOCKTIME,
+                 socket_path=config.DAEMON_SOCKET):
+        self.client = FicsClient(config.SETTINGS["fics"]["server"],
+                                 config.SETTINGS["fics"]["port"],
+                                 config.SETTINGS["fics"]["read_size"])
+        self.user = user
+        self.password = password
+        self.commands = list(commands)  # sent when the session starts
+        self.games = GameRegistry()
+        self.game = Game()  # the last updated game, analysed by the engine
+        self.game_number = None  # its fics number
+        self.analysed = self.game  # the game of the engine search
+        self.engine = engine
+        self.stocktime = stocktime
+        self.socket_path = socket_path
+        self.pgn = PgnWriter(config.PGN_FILE)
+        self.archive = Archive(config.ARCHIVE_FILE)
+        self.positions = PositionIndex(self.archive)
+        self.explorer = Explorer(self.archive)
+        self.stats = collections.Counter()
+        self.loop = None
+        self.merging = None  # the future of the index and tree merges
+        self.dispatcher = Dispatcher.for_object(self)
+        if engine is not None:
+            engine.connect("sf_info", self.on_sf_info)
+
+    async def run(self):
+        """Follow fics until the connection ends"""
+        self.loop = asyncio.get_event_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            self.loop.add_signal_handler(signum, self.client.close)
+        await self.client.connect()
+        control = None
+        if self.socket_path:
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            control = await asyncio.start_unix_server(
+                self.control, self.socket_path)
+        try:
+            async for message in self.client:
+                self.handle(message)
+        finally:
+            if control is not None:
+                control.close()
+                os.remove(self.socket_path)
+            self.pgn.flush()
+            if self.engine is not None:
+                self.engine.quit()
+        logger.info("Disconnected from FICS")
+
+    def handle(self, message):
+        """Handle a fics message"""
+        self.stats["messages"] += 1
+        self.dispatcher.dispatch(message)
+
+    def fics_login(self, _message, _match):
+        """Send the username"""
+        self.client.write(self.user)
+
+    def fics_password(self, _message, _match):
+        """Send the password"""
+        self.client.write(self.password)
+
+    def fics_press_return(self, _message, _match):
+        """Enter the server as guest"""
+        self.client.write("")
+
+    def fics_session(self, message, _match):
+        """Logged in, set the fics parameters"""
+        logger.info(message)
+        for command in ["set style 12", "set bell off"] + self.commands:
+            self.client.write(command)
+
+    def fics_style12(self, message, _match):
+        """A style12 position"""
+        self.style12(message)
+
+    def fics_result(self, _message, match):
+        """A game ended"""
+        self.finish(int(match.group("game_no")), match.group("result"))
+
+    def fics_removed(self, _message, match):
+        """A game is no longer observed, it is not saved"""
+        game_number = int(match.group("game_no"))
+        if self.games.finish(game_number) is not None:
+            logger.debug("Stopped following game {0}".format(game_number))
+
+    def style12(self, line):
+        """Follow a style12 position"""
+        try:
+            position = Position(line)
+        except PyficsError as error:
+            logger.error(error)
+            return
+        self.stats["positions"] += 1
+        if position.game_number not in self.games:
+            logger.debug("Following game {0}".format(position.game_number))
+        self.game, _move = self.games.update(position)
+        self.game_number = position.game_number
+        self.analyse()
+
+    def finish(self, game_number, result):
+        """Save a followed game when it ended"""
+        game = self.games.finish(game_number)
+        if game is None:
+            return
+        fill_tags(game, result)
+        self.pgn.write(game)
+        self.archive.append(game)
+        self.update_indexes()
+        self.stats["games"] += 1
+        logger.info("Saved game {0}: {1} vs {2} {3}".format(
+            game_number, game.tags["White"], game.tags["Black"],
+            game.tags["Result"]))
+
+    def update_indexes(self):
+        """Add the saved games to the position index and the opening
+            tree; a merge of their delta files runs in an executor"""
+        if self.merging is not None:
+            # the games are added when the merge is done
+            return
+        stores = [self.positions, self.explorer]
+        for store in stores:
+            store.update(merge=False)
+        stores = [store for store in stores if store.needs_merge()]
+        if stores:
+            self.merging = self.loop.run_in_executor(
+                None, self.merge_indexes, stores)
+            self.merging.add_done_callback(self.merged)
+
+    @staticmethod
+    def merge_indexes(stores):
+        """Merge the delta files, from the executor"""
+        for store in stores:
+            store.merge()
+
+    def merged(self, future):
+        """The merges are done"""
+        self.merging = None
+        if not future.cancelled() and future.exception() is not None:
+            logger.error("Merge failed: {0}".format(future.exception()))
+        self.update_indexes()
+
+    def analyse(self):
+        """Let the engine analyse the current position"""
+        if self.engine is None or not self.engine.enabled:
+            return
+        if self.engine.finding_best_move:
+            self.engine.write("stop")
+        self.analysed = self.game
+        position = self.game.position
+        self.engine.search(position.halfmove, fen=position.get_fen(),
+                           stocktime=self.stocktime, key=position.key)
+
+    def on_sf_info(self, _engine, info):
+        """Engine info, from the thread of the engine"""
+        self.loop.call_soon_threadsafe(self.analysed.update_info, info)
+
+    def get_status(self):
+        """The counters and the last updated game"""
+        status = dict(self.stats)
+        status.update({
+            "connected": self.client.connected,
+            "followed": len(self.games),
+            "game": self.game_number,
+            "halfmove": self.game.position.halfmove,
+            "archive": len(self.archive)})
+        return status
+
+    async def control(self, reader, writer):
+        """Answer the commands of a control connection"""
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            command, _sep, argument = line.decode("utf-8").strip().partition(
+                " ")
+            if command == "status":
+                reply = json.dumps(self.get_status())
+            elif command == "send":
+                self.client.write(argument)
+                reply = "ok"
+            elif command == "quit":
+                self.client.close()
+                reply = "ok"
+            else:
+                reply = "unknown command: {0}".format(command)
+            writer.write((reply + "\n").encode("utf-8"))
+            await writer.drain()
+        writer.close()
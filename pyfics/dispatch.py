@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*-coding: utf-8-*-
+
+"""Dispatch of fics messages to handlers
+
+    the patterns of the messages are compiled once and looked up in a
+    trie of their literal prefixes, so a message is only matched against
+    the patterns that can match it, instead of the whole chain."""
+
+from __future__ import (division, absolute_import, unicode_literals,
+                        print_function)
+
+import re
+import operator
+
+# the fics messages: handler name, literal prefix, pattern matched at
+# the start of the message; a message without a matching pattern goes to
+# the default handler
+FICS_MESSAGES = (
+    ("login", "login:", "login:"),
+    ("password", "password:", "password:"),
+    ("press_return", "Press return to enter the server",
+     "Press return to enter the server"),
+    ("session", "", ".*Starting FICS session"),
+    ("logout", "", r"\W*Logging you out|\*\*\*\* Auto-logout"),
+    ("style12", "<12>", "(?s)(<12>.*)"),
+    ("result", "{Game ",
+     r"{Game (?P<game_no>\d+) \((?P<players>.*)\)" +
+     " (?P<action>.+)} (?P<result>.+)"),
+    ("unexamine", "You are no longer examining game ",
+     "You are no longer examining game (?P<game_no>.*)"),
+    ("ignore", "", "(?P<opponent>.*) accepts your seek."),
+    ("ignore", "Your seek matches", "Your seek matches"),
+    ("ignore", "Your seek intercepts ", "Your seek intercepts .*'s getgame."),
+    ("ignore", "Your opponent has aborted the game",
+     "Your opponent has aborted the game"),
+    ("info", "Checking if really out of time",
+     "Checking if really out of time"),
+    ("info", "Opponent is not out of time, priming autoflag",
+     "Opponent is not out of time, priming autoflag"),
+    ("ignore", "Game ",
+     r"Game (?P<game_no>\d*): (?P<opponent>.*) moves: (?P<move>.*)"),
+    ("game_info", "Game ", r"Game (?P<game_no>\d*): (?P<message>.*)"),
+    ("creating", "Creating: ",
+     r"Creating: (?P<white>.*) (?P<white_rating>\(.*\))" +
+     r"(?P<black>.*) (?P<black_rating>\(.*\))" +
+     "(?P<timing>.*)\n" +
+     r"{Game (?P<game_no>\d)* .*}"),
+    ("examine", "Starting a game in examine (scratch) mode",
+     r"Starting a game in examine \(scratch\) mode"),
+    ("info", "Illegal move", "Illegal move"),
+    ("removed", "Removing game ", r"Removing game (?P<game_no>\d+) from"))
+
+
+class Dispatcher(object):
+    """Call the handler of the first pattern matching a message
+        handlers are called with the message and the match. The patterns
+        of the prefixes of a message are tried in the order they were
+        added, then the patterns without a prefix: unlike in the former
+        chain of Player.parse_fics, a pattern without a prefix never
+        comes first"""
+
+    def __init__(self, default=None):
+        self.trie = {}  # char -> node, None -> the entries of the prefix
+        self.generic = []  # the entries without a prefix
+        self.default = default  # called with the message and None
+        self.count = 0
+
+    @classmethod
+    def from_table(cls, table, handlers, default=None):
+        """A Dispatcher of a table like FICS_MESSAGES, with the handlers
+            by name; the patterns without a handler are left out"""
+        dispatcher = cls(default)
+        for name, prefix, pattern in table:
+            if name in handlers:
+                dispatcher.add(pattern, handlers[name], prefix)
+        return dispatcher
+
+    @classmethod
+    def for_object(cls, instance, table=FICS_MESSAGES, default=None):
+        """A Dispatcher of table to the fics_<name> methods of instance"""
+        return cls.from_table(table, {
+            name: getattr(instance, "fics_" + name)
+            for name, _prefix, _pattern in table
+            if hasattr(instance, "fics_" + name)}, default)
+
+    def add(self, pattern, handler, prefix=""):
+        """Add a pattern, which can only match messages starting with
+            the literal prefix"""
+        entry = (self.count, re.compile(pattern), handler)
+        self.count += 1
+        if not prefix:
+            self.generic.append(entry)
+            return
+        node = self.trie
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node.setdefault(None, []).append(entry)
+
+    def get_entries(self, message):
+        """The entries that can match message, in the order to try"""
+        found = []
+        node = self.trie
+        for char in message:
+            node = node.get(char)
+            if node is None:
+                break
+            if None in node:
+                found.append(node[None])
+        if not found:
+            return self.generic
+        if len(found) == 1:
+            return found[0] + self.generic
+        return sorted(sum(found, []),
+                      key=operator.itemgetter(0)) + self.generic
+
+    def dispatch(self, message):
+        """Call the handler of message, return its result"""
+        for _index, regex, handler in self.get_entries(message):
+            match = regex.match(message)
+            if match:
+                return handler(message, match)
+        if self.default is not None:
+            return self.default(message, None)
+        return None
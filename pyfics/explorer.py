@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*-coding: utf-8-*-
+
+"""Opening explorer: the moves played in a position and how they scored
+
+    the tree is a ColumnStore of records sorted by position key and
+    move, which sum the games of a move. The delta file holds single
+    moves, which are aggregated into records when the delta is read and
+    combined with the tree when it is merged."""
+
+from __future__ import (division, absolute_import, unicode_literals,
+                        print_function)
+
+import numpy
+
+from .exceptions import PyficsError
+from .archive import RESULTS, encode_move, decode_code, decode_move
+from .store import ColumnStore
+
+# a move played in a game, as stored in the delta file
+PLY = numpy.dtype([("key", "<u8"), ("move", "<u2"), ("game", "<u4"),
+                   ("result", "u1"), ("rating", "<u2")])
+# the aggregated moves of the tree
+RECORD = numpy.dtype([
+    ("key", "<u8"), ("move", "<u2"), ("games", "<u4"), ("white", "<u4"),
+    ("draw", "<u4"), ("black", "<u4"), ("rating", "<u8"), ("rated", "<u4")])
+DEPTH = 40  # plies of every game in the tree
+
+
+def aggregate(plies):
+    """Sum the plies by key and move into tree records"""
+    plies = plies[numpy.lexsort((plies["move"], plies["key"]))]
+    new = numpy.ones(len(plies), bool)
+    new[1:] = ((plies["key"][1:] != plies["key"][:-1]) |
+               (plies["move"][1:] != plies["move"][:-1]))
+    starts = numpy.flatnonzero(new)
+    records = numpy.zeros(len(starts), RECORD)
+    if not len(starts):
+        return records
+    records["key"] = plies["key"][starts]
+    records["move"] = plies["move"][starts]
+    records["games"] = numpy.add.reduceat(numpy.ones(len(plies), int), starts)
+    for name, result in (("white", "1-0"), ("draw", "1/2-1/2"),
+                         ("black", "0-1")):
+        records[name] = numpy.add.reduceat(
+            (plies["result"] == RESULTS.index(result)).astype(int), starts)
+    records["rating"] = numpy.add.reduceat(
+        plies["rating"].astype("u8"), starts)
+    records["rated"] = numpy.add.reduceat(
+        (plies["rating"] > 0).astype(int), starts)
+    return records
+
+
+def combine(records):
+    """Sum tree records with the same key and move"""
+    records = records[numpy.lexsort((records["move"], records["key"]))]
+    new = numpy.ones(len(records), bool)
+    new[1:] = ((records["key"][1:] != records["key"][:-1]) |
+               (records["move"][1:] != records["move"][:-1]))
+    starts = numpy.flatnonzero(new)
+    if len(starts) == len(records):
+        return records
+    combined = records[starts]
+    for name in ("games", "white", "draw", "black", "rating", "rated"):
+        combined[name] = numpy.add.reduceat(records[name], starts)
+    return combined
+
+
+class Explorer(ColumnStore):
+    """The opening tree of the games in an Archive"""
+    RECORD = RECORD
+    DELTA = PLY
+    SUFFIX = ".tree"
+
+    def __init__(self, archive, depth=DEPTH):
+        super(Explorer, self).__init__(archive)
+        self.depth = depth
+
+    def game_records(self, number):
+        """The first moves of archive game number"""
+        header = self.archive.get_header(number)
+        result = RESULTS.index(header["Result"])
+        plies = []
+        for position, move in self.archive.replay(number):
+            if move is None or len(plies) == self.depth:
+                break
+            plies.append((position.key, encode_move(move), number, result,
+                          header["WhiteElo" if position.next_color == "W"
+                                 else "BlackElo"]))
+        if not plies:
+            # keep the game, so the number of aggregated games is known
+            plies.append((0, 0, number, 0, 0))
+        return numpy.array(plies, PLY)
+
+    def sort_delta(self, delta):
+        return aggregate(delta)
+
+    def merge_columns(self, columns, delta):
+        records = numpy.zeros(len(columns["key"]), RECORD)
+        for name in RECORD.names:
+            records[name] = columns[name]
+        records = combine(numpy.concatenate([records, delta]))
+        for name in RECORD.names:
+            yield records[name]
+
+    def find(self, key):
+        """Return the tree records of the position with key"""
+        columns, start, end, delta = self.find_range(key)
+        records = numpy.zeros(end - start, RECORD)
+        for name in RECORD.names:
+            records[name] = columns[name][start:end]
+        return combine(numpy.concatenate([records, delta]))
+
+    def get_moves(self, position):
+        """The moves played in position, most played first, as dicts
+            with the move, its san, the number of games, the white, draw
+            and black percentages and the average rating"""
+        moves = []
+        for record in self.find(position.key):
+            try:
+                move = decode_move(
+                    position, decode_code(int(record["move"])))
+                san = position.get_san(move)
+            except PyficsError:
+                # another position with the same key
+                continue
+            games = int(record["games"])
+            moves.append({
+                "move": move,
+                "san": san,
+                "games": games,
+                "white": 100 * int(record["white"]) / games,
+                "draw": 100 * int(record["draw"]) / games,
+                "black": 100 * int(record["black"]) / games,
+                "rating": (int(record["rating"]) // int(record["rated"])
+                           if record["rated"] else None)})
+        moves.sort(key=lambda move: move["games"], reverse=True)
+        return moves
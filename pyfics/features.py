@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*-coding: utf-8-*-
+
+"""Evaluation features of many positions at once, with numpy
+
+    positions are stored as an (N, 64) array of piece codes, square 0 is
+    a1 as in Position.board, code 0 is an empty square and 1..12 are the
+    pieces of PIECES. Every feature is computed for all rows together,
+    mostly from the (N, 12) array of uint64 bitboards of the pieces."""
+
+from __future__ import (division, absolute_import, unicode_literals,
+                        print_function)
+
+import numpy
+
+from . import config
+
+PIECES = "PNBRQKpnbrqk"
+CODES = numpy.zeros(256, numpy.uint8)
+for _code, _symbol in enumerate(PIECES, 1):
+    CODES[ord(_symbol)] = _code
+
+# material of the piece codes, positive for white
+VALUES = numpy.array(
+    [0] + [config.PIECE_VALUE[symbol.upper()] for symbol in PIECES[:6]] +
+    [-config.PIECE_VALUE[symbol.upper()] for symbol in PIECES[6:]])
+
+# phase weight of the piece codes, 24 with all pieces on the board
+PHASE_WEIGHTS = numpy.array([0] + 2 * [0, 1, 1, 2, 4, 0])
+PHASES = ("opening", "middlegame", "endgame")
+OPENING, ENDGAME = 22, 8  # weights from which a phase starts
+
+# piece-square values in centipawns for white, from a8 to h1
+_PIECE_SQUARES = {
+    "P": [0, 0, 0, 0, 0, 0, 0, 0,
+          50, 50, 50, 50, 50, 50, 50, 50,
+          10, 10, 20, 30, 30, 20, 10, 10,
+          5, 5, 10, 25, 25, 10, 5, 5,
+          0, 0, 0, 20, 20, 0, 0, 0,
+          5, -5, -10, 0, 0, -10, -5, 5,
+          5, 10, 10, -20, -20, 10, 10, 5,
+          0, 0, 0, 0, 0, 0, 0, 0],
+    "N": [-50, -40, -30, -30, -30, -30, -40, -50,
+          -40, -20, 0, 0, 0, 0, -20, -40,
+          -30, 0, 10, 15, 15, 10, 0, -30,
+          -30, 5, 15, 20, 20, 15, 5, -30,
+          -30, 0, 15, 20, 20, 15, 0, -30,
+          -30, 5, 10, 15, 15, 10, 5, -30,
+          -40, -20, 0, 5, 5, 0, -20, -40,
+          -50, -40, -30, -30, -30, -30, -40, -50],
+    "B": [-20, -10, -10, -10, -10, -10, -10, -20,
+          -10, 0, 0, 0, 0, 0, 0, -10,
+          -10, 0, 5, 10, 10, 5, 0, -10,
+          -10, 5, 5, 10, 10, 5, 5, -10,
+          -10, 0, 10, 10, 10, 10, 0, -10,
+          -10, 10, 10, 10, 10, 10, 10, -10,
+          -10, 5, 0, 0, 0, 0, 5, -10,
+          -20, -10, -10, -10, -10, -10, -10, -20],
+    "R": [0, 0, 0, 0, 0, 0, 0, 0,
+          5, 10, 10, 10, 10, 10, 10, 5,
+          -5, 0, 0, 0, 0, 0, 0, -5,
+          -5, 0, 0, 0, 0, 0, 0, -5,
+          -5, 0, 0, 0, 0, 0, 0, -5,
+          -5, 0, 0, 0, 0, 0, 0, -5,
+          -5, 0, 0, 0, 0, 0, 0, -5,
+          0, 0, 0, 5, 5, 0, 0, 0],
+    "Q": [-20, -10, -10, -5, -5, -10, -10, -20,
+          -10, 0, 0, 0, 0, 0, 0, -10,
+          -10, 0, 5, 5, 5, 5, 0, -10,
+          -5, 0, 5, 5, 5, 5, 0, -5,
+          0, 0, 5, 5, 5, 5, 0, -5,
+          -10, 5, 5, 5, 5, 5, 0, -10,
+          -10, 0, 5, 0, 0, 0, 0, -10,
+          -20, -10, -10, -5, -5, -10, -10, -20],
+    "K": [-30, -40, -40, -50, -50, -40, -40, -30,
+          -30, -40, -40, -50, -50, -40, -40, -30,
+          -30, -40, -40, -50, -50, -40, -40, -30,
+          -30, -40, -40, -50, -50, -40, -40, -30,
+          -20, -30, -30, -40, -40, -30, -30, -20,
+          -10, -20, -20, -20, -20, -20, -20, -10,
+          20, 20, 0, 0, 0, 0, 20, 20,
+          20, 30, 10, 0, 0, 10, 30, 20]}
+# by code and square from a1, black mirrored and negative
+PIECE_SQUARES = numpy.zeros((len(PIECES) + 1, 64), int)
+for _code, _symbol in enumerate(PIECES, 1):
+    _table = numpy.array(_PIECE_SQUARES[_symbol.upper()]).reshape(8, 8)
+    PIECE_SQUARES[_code] = (_table[::-1].ravel() if _symbol.isupper() else
+                            -_table.ravel())
+
+
+# bitboards: bit n is square n
+FULL = numpy.uint64(0xffffffffffffffff)
+FILE_A = numpy.uint64(0x0101010101010101)
+FILE_B, FILE_G, FILE_H = (FILE_A << numpy.uint64(col) for col in (1, 6, 7))
+NOT_A, NOT_H = ~FILE_A, ~FILE_H
+NOT_AB, NOT_GH = ~(FILE_A | FILE_B), ~(FILE_G | FILE_H)
+# the shift of a step and the squares it can not reach by wrapping
+KNIGHT_STEPS = [(17, NOT_A), (15, NOT_H), (10, NOT_AB), (6, NOT_GH),
+                (-6, NOT_AB), (-10, NOT_GH), (-15, NOT_A), (-17, NOT_H)]
+ROOK_STEPS = [(8, FULL), (-8, FULL), (1, NOT_A), (-1, NOT_H)]
+BISHOP_STEPS = [(9, NOT_A), (7, NOT_H), (-7, NOT_A), (-9, NOT_H)]
+KING_STEPS = ROOK_STEPS + BISHOP_STEPS
+M1, M2, M4, H01 = (numpy.uint64(mask) for mask in (
+    0x5555555555555555, 0x3333333333333333, 0x0f0f0f0f0f0f0f0f,
+    0x0101010101010101))
+
+
+def _shift(bits, step, mask):
+    """Move all bits one step"""
+    if step > 0:
+        return (bits << numpy.uint64(step)) & mask
+    return (bits >> numpy.uint64(-step)) & mask
+
+
+def popcount(bits):
+    """Number of set bits of every uint64"""
+    if hasattr(numpy, "bitwise_count"):
+        return numpy.bitwise_count(bits).astype(int)
+    # numpy < 2.0: add the bits in pairs, nibbles and bytes
+    bits = bits - ((bits >> numpy.uint64(1)) & M1)
+    bits = (bits & M2) + ((bits >> numpy.uint64(2)) & M2)
+    bits = (bits + (bits >> numpy.uint64(4))) & M4
+    return ((bits * H01) >> numpy.uint64(56)).astype(int)
+
+
+def boards(positions):
+    """Piece codes of positions, as an (N, 64) array"""
+    data = "".join(position.get_board_key() for position in positions)
+    return CODES[numpy.frombuffer(data.encode("ascii"), numpy.uint8)
+                 ].reshape(-1, 64)
+
+
+def planes(codes):
+    """One bit plane per piece, as an (N, 12, 64) array"""
+    return numpy.stack(
+        [codes == code for code in range(1, len(PIECES) + 1)], axis=1)
+
+
+def bitboards(codes):
+    """One uint64 per piece, as an (N, 12) array"""
+    return numpy.stack([
+        numpy.packbits(codes == code, axis=-1, bitorder="little").view("<u8")
+        [:, 0] for code in range(1, len(PIECES) + 1)], axis=1)
+
+
+def material(codes, bits=None):
+    """Material balance in pawns, positive when white is ahead"""
+    bits = bitboards(codes) if bits is None else bits
+    return popcount(bits).dot(VALUES[1:])
+
+
+def piece_square(codes):
+    """Piece-square balance in centipawns, positive for white"""
+    return PIECE_SQUARES[codes, numpy.arange(64)].sum(axis=1)
+
+
+def phase(codes, bits=None):
+    """Phase weight (24 at the start, 0 with only kings and pawns)
+        and the index in PHASES"""
+    bits = bitboards(codes) if bits is None else bits
+    weights = numpy.minimum(popcount(bits).dot(PHASE_WEIGHTS[1:]), 24)
+    labels = numpy.where(weights >= OPENING, 0,
+                         numpy.where(weights > ENDGAME, 1, 2))
+    return weights, labels
+
+
+def _moves(pieces, own, empty, steps, slide):
+    """Count the moves of pieces to squares without own pieces
+        sliding pieces stop at the first occupied square; the targets of
+        one step never overlap, so counting them counts the moves"""
+    count = 0
+    for step, mask in steps:
+        bits = _shift(pieces, step, mask)
+        targets = bits
+        for _step in range(6 if slide else 0):
+            bits = _shift(bits & empty, step, mask)
+            targets = targets | bits
+        count = count + popcount(targets & ~own)
+    return count
+
+
+def mobility(codes, bits=None):
+    """Moves of the knights, bishops, rooks, queens and kings of white
+        and black, ignoring pins and checks, as an (N, 2) array"""
+    bits = bitboards(codes) if bits is None else bits
+    occupied = numpy.bitwise_or.reduce(bits, axis=1)
+    empty = ~occupied
+    result = numpy.zeros((len(bits), 2), int)
+    for side, offset in enumerate((0, 6)):
+        own = numpy.bitwise_or.reduce(bits[:, offset:offset + 6], axis=1)
+        (_pawn, knight, bishop, rook, queen, king) = (
+            bits[:, offset + index] for index in range(6))
+        result[:, side] = (
+            _moves(knight, own, empty, KNIGHT_STEPS, False) +
+            _moves(king, own, empty, KING_STEPS, False) +
+            _moves(bishop | queen, own, empty, BISHOP_STEPS, True) +
+            _moves(rook | queen, own, empty, ROOK_STEPS, True))
+    return result
+
+
+def features(codes, chunk=100000):
+    """All features of codes, computed chunk rows at a time"""
+    parts = []
+    for start in range(0, max(len(codes), 1), chunk):
+        part = codes[start:start + chunk]
+        bits = bitboards(part)
+        weights, labels = phase(part, bits)
+        parts.append({"material": material(part, bits),
+                      "piece_square": piece_square(part),
+                      "mobility": mobility(part, bits),
+                      "phase": weights,
+                      "label": labels})
+    return {name: numpy.concatenate([part[name] for part in parts])
+            for name in parts[0]}
+
+
+def archive_boards(archive, numbers=None):
+    """Piece codes of every position of archive games, with the number
+        and ply of the game of each row"""
+    keys, games, plies = [], [], []
+    for number in range(len(archive)) if numbers is None else numbers:
+        for ply, (position, _move) in enumerate(archive.replay(number)):
+            keys.append(position.get_board_key())
+            games.append(number)
+            plies.append(ply)
+    codes = CODES[numpy.frombuffer("".join(keys).encode("ascii"),
+                                   numpy.uint8)].reshape(-1, 64)
+    return codes, numpy.array(games, int), numpy.array(plies, int)
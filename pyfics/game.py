@@ -8,7 +8,7 @@ from __future__ import (division, absolute_import, unicode_literals,
 
 import re
 import sys  # pylint: disable=W0611
-import copy
+import random
 import logging
 import collections
 
@@ -28,30 +28,6 @@ def switch_color(color):
     return "W" if color == "B" else "B"
 
 
-def get_short_move(notation, move):
-    """short move notation"""
-    if "/" not in notation:
-        short = notation
-    else:
-        if move["letter"] == "P":
-            if "taken" in move:
-                short = "{0}x{1}".format(
-                    move["squares"][0][0], move["squares"][1])
-            else:
-                short = move["squares"][1]
-        else:
-            if "taken" in move:
-                short = "{0}x{1}".format(
-                    move["letter"], move["squares"][1])
-            else:
-                short = "{0}{1}".format(
-                    move["letter"], move["squares"][1])
-        if "promotion" in move:
-            # promotion
-            short += "={0}".format(move["promotion"].upper())
-    return short
-
-
 def notation_to_sf_move(notation, color):
     """Convert notation to sf-compatible move"""
     if notation == "none":
@@ -64,242 +40,817 @@ def notation_to_sf_move(notation, color):
         return "e1c1"
     if notation == "o-o-o" and color == "B":
         return "e8c8"
-    return notation.split("/")[1].replace("-", "")
-
-
-def rowcol_to_square(row, col, color):
-    """Convert row/col numbers to square"""
-    # row: 1..8, col: 1..8
-    row, col = row - 1, col - 1
-    if color == "B":
-        row, col = 7 - row, 7 - col
-    return "%s%d" % ("abcdefgh"[col], row + 1)
-
+    sf_move = notation.split("/")[1].replace("-", "")
+    # promotion: e7e8=Q -> e7e8q
+    return sf_move.replace("=", "").lower()
+
+
+# board index: 0 = a1, 7 = h1, 56 = a8, 63 = h8
+SQUARES = ["{0}{1}".format(letter, number)
+           for number in range(1, 9)
+           for letter in "abcdefgh"]
+SQUARE_INDEX = {square: index for index, square in enumerate(SQUARES)}
+
+
+def _leaper_table(offsets):
+    """For every square, the squares reached by the (row, col) offsets"""
+    return [tuple(8 * (index // 8 + row) + index % 8 + col
+                  for row, col in offsets
+                  if 0 <= index // 8 + row < 8 and 0 <= index % 8 + col < 8)
+            for index in range(64)]
+
+
+def _ray_table(directions):
+    """For every square, the rays in the (row, col) directions"""
+    rays = []
+    for index in range(64):
+        square_rays = []
+        for row_step, col_step in directions:
+            ray = []
+            row, col = index // 8 + row_step, index % 8 + col_step
+            while 0 <= row < 8 and 0 <= col < 8:
+                ray.append(8 * row + col)
+                row, col = row + row_step, col + col_step
+            if ray:
+                square_rays.append(tuple(ray))
+        rays.append(tuple(square_rays))
+    return rays
+
+
+KNIGHT_ATTACKS = _leaper_table(
+    [(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)])
+KING_ATTACKS = _leaper_table(
+    [(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)])
+# the squares a pawn of the color attacks
+PAWN_ATTACKS = {"W": _leaper_table([(1, -1), (1, 1)]),
+                "B": _leaper_table([(-1, -1), (-1, 1)])}
+ROOK_RAYS = _ray_table([(1, 0), (0, 1), (-1, 0), (0, -1)])
+BISHOP_RAYS = _ray_table([(1, 1), (1, -1), (-1, 1), (-1, -1)])
+
+# the symbols of pawn, knight, bishop, rook, queen and king per color
+PIECES = {"W": ("P", "N", "B", "R", "Q", "K"),
+          "B": ("p", "n", "b", "r", "q", "k")}
+
+# castling rights as bits of Position.castling
+WHITE_SHORT, WHITE_LONG, BLACK_SHORT, BLACK_LONG = 1, 2, 4, 8
+
+# castling per color and notation: the right, the king move,
+# the squares which have to be empty and the squares the king passes
+CASTLES = {
+    ("W", "o-o"): (WHITE_SHORT, 4, 6, (5, 6), (4, 5, 6)),
+    ("W", "o-o-o"): (WHITE_LONG, 4, 2, (1, 2, 3), (4, 3, 2)),
+    ("B", "o-o"): (BLACK_SHORT, 60, 62, (61, 62), (60, 61, 62)),
+    ("B", "o-o-o"): (BLACK_LONG, 60, 58, (57, 58, 59), (60, 59, 58))}
+# the king moves that castle, as (king, start, end)
+KING_CASTLES = frozenset(
+    ("K" if color == "W" else "k", start, end)
+    for (color, _notation), (_flag, start, end, _empty, _path)
+    in CASTLES.items())
+# the rook move when castling, by destination of the king
+ROOK_CASTLES = {6: (7, 5), 2: (0, 3), 62: (63, 61), 58: (56, 59)}
+# castling rights left after a move from or to the square
+CASTLE_MASKS = [15] * 64
+for _square, _flags in ((0, WHITE_LONG), (4, WHITE_SHORT | WHITE_LONG),
+                        (7, WHITE_SHORT), (56, BLACK_LONG),
+                        (60, BLACK_SHORT | BLACK_LONG), (63, BLACK_SHORT)):
+    CASTLE_MASKS[_square] = 15 & ~_flags
+
+# flags of a Move
+CASTLE, ENPASSANT = 1, 2
+
+# piece, column, row, capture, square and promotion of a san move
+SAN_REGEX = re.compile(
+    r"([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?$")
+
+# zobrist keys, with a fixed seed so keys are stable between sessions
+_RANDOM = random.Random(12)
+ZOBRIST_PIECES = {symbol: [_RANDOM.getrandbits(64) for _index in range(64)]
+                  for symbol in PIECES["W"] + PIECES["B"]}
+ZOBRIST_BLACK = _RANDOM.getrandbits(64)
+ZOBRIST_CASTLING = [_RANDOM.getrandbits(64) for _castling in range(16)]
+# indexed by double_pawn_move, so the last entry (-1: none) is 0
+ZOBRIST_ENPASSANT = [_RANDOM.getrandbits(64) for _col in range(8)] + [0]
+
+
+def _castle_property(flag):
+    """Expose one castling bit as the 0/1 style12 field"""
+
+    def fget(self):
+        """Castling right as integer"""
+        return 1 if self.castling & flag else 0
+
+    def fset(self, value):
+        """Set or clear the castling right, and update the key"""
+        castling = self.castling | flag if value else self.castling & ~flag
+        self.key ^= ZOBRIST_CASTLING[self.castling] ^ ZOBRIST_CASTLING[
+            castling]
+        self.castling = castling
+        self.touch()
+
+    return property(fget, fset)
+
+
+def _last_move_property(slot, derive):
+    """Expose a notation of the last move, derived on first access"""
+
+    def fget(self):
+        """Stored or derived notation"""
+        value = getattr(self, slot)
+        if value is None:
+            value = derive(self)
+            setattr(self, slot, value)
+        return value
+
+    def fset(self, value):
+        """Store the notation, as received in style12"""
+        setattr(self, slot, value)
+        self.touch()
+
+    return property(fget, fset)
+
+
+def _style12_property(slot, index):
+    """Expose a rarely used style12 field, decoded on first access"""
+
+    def fget(self):
+        """Stored or decoded field"""
+        value = getattr(self, slot)
+        if value is None:
+            value = self._fields[index] if index < len(self._fields) else ""
+            try:
+                value = int(value)
+            except ValueError:
+                pass
+            setattr(self, slot, value)
+        return value
+
+    def fset(self, value):
+        """Store the field"""
+        setattr(self, slot, value)
+        self.touch()
+
+    return property(fget, fset)
+
+
+def fen_to_style12(fen):
+    """Convert a fen string to a style12 string"""
+    board, color, castle, enpassant, irreversible, move_number = (
+        fen.split(" ") + ["0", "1"])[:6]
+    rows = re.sub(r"\d", lambda match: int(match.group()) * "-",
+                  board).split("/")
+    material = {
+        color: sum(config.PIECE_VALUE[symbol.upper()]
+                   for symbol in board
+                   if symbol.upper() in config.PIECE_VALUE and
+                   get_color(symbol) == color)
+        for color in "WB"}
+    return " ".join(
+        ["<12>"] + rows +
+        [color.upper(),
+         str("abcdefgh".index(enpassant[0]) if enpassant != "-" else -1)] +
+        ["1" if letter in castle else "0" for letter in "KQkq"] +
+        [irreversible, "0", "WHITE", "BLACK", "2", "0", "0",
+         str(material["W"]), str(material["B"]), "0", "0", move_number,
+         "none", "(0:00)", "none", "0", "0", "0"])
+
+
+class Move(collections.namedtuple(
+        "Move", ["start", "end", "symbol", "taken", "promotion", "flags"])):
+    """A move, as board indices and symbols
+        the notations are derived on request"""
+    __slots__ = ()
+
+    @property
+    def color(self):
+        """Color of the moving piece"""
+        return get_color(self.symbol)
+
+    @property
+    def letter(self):
+        """Letter of the moving piece"""
+        return self.symbol.upper()
+
+    @property
+    def squares(self):
+        """Start and end square"""
+        return SQUARES[self.start], SQUARES[self.end]
+
+    @property
+    def rook(self):
+        """Start and end index of the rook when castling"""
+        return ROOK_CASTLES[self.end] if self.flags & CASTLE else None
+
+    @property
+    def enpassant(self):
+        """Index of the pawn taken en passant"""
+        if not self.flags & ENPASSANT:
+            return None
+        return self.end - 8 if self.symbol == "P" else self.end + 8
+
+    @property
+    def notation(self):
+        """Fics notation (P/e2-e4, o-o)"""
+        if self.flags & CASTLE:
+            return "o-o" if self.end > self.start else "o-o-o"
+        notation = "{0}/{1}-{2}".format(
+            self.letter, SQUARES[self.start], SQUARES[self.end])
+        if self.promotion is not None:
+            notation += "=" + self.promotion.upper()
+        return notation
 
-def square_to_rowcol(square, color):
-    """Convert square to row/col number"""
-    # row: 1..8, col: 1..8
-    row = int(square[1]) - 1
-    col = "abcdefgh".index(square[0])
-    if color == "B":
-        row, col = 7 - row, 7 - col
-    return row + 1, col + 1
+    @property
+    def short(self):
+        """Short move notation, without check"""
+        if self.flags & CASTLE:
+            return self.notation
+        if self.letter == "P":
+            short = (
+                "{0}x{1}".format(SQUARES[self.start][0], SQUARES[self.end])
+                if self.taken is not None else
+                SQUARES[self.end])
+        else:
+            short = "{0}{1}{2}".format(
+                self.letter, "x" if self.taken is not None else "",
+                SQUARES[self.end])
+        if self.promotion is not None:
+            short += "=" + self.promotion.upper()
+        return short
+
+    @property
+    def sf_move(self):
+        """UCI notation, as used by stockfish"""
+        sf_move = SQUARES[self.start] + SQUARES[self.end]
+        if self.promotion is not None:
+            sf_move += self.promotion.lower()
+        return sf_move
+
+    @property
+    def fics_move(self):
+        """Coordinate notation for the fics command line"""
+        fics_move = SQUARES[self.start] + SQUARES[self.end]
+        if self.promotion is not None:
+            fics_move += "=" + self.promotion.upper()
+        return fics_move
 
 
 class Position(object):
     """The current position on the board"""
+    # (too many instance attributes) pylint: disable=R0902
+
+    __slots__ = (
+        "board", "kings", "key", "halfmove", "last_move", "next_color",
+        "double_pawn_move", "castling", "moves_irreversible", "game_number",
+        "relation", "white_material", "black_material", "white_time",
+        "black_time", "next_move_number", "orientation",
+        "_notation", "_last_move_short", "_sf_move",
+        "_fields", "_white_name", "_black_name", "_initial_time",
+        "_increment", "_move_time", "_extra1", "_extra2",
+        "_board_key", "_fen", "_style12", "_shared")
+
+    white_castle_short = _castle_property(WHITE_SHORT)
+    white_castle_long = _castle_property(WHITE_LONG)
+    black_castle_short = _castle_property(BLACK_SHORT)
+    black_castle_long = _castle_property(BLACK_LONG)
+
+    # fields which are only decoded when asked for
+    white_name = _style12_property("_white_name", 17)
+    black_name = _style12_property("_black_name", 18)
+    initial_time = _style12_property("_initial_time", 20)
+    increment = _style12_property("_increment", 21)
+    move_time = _style12_property("_move_time", 28)
+    extra1 = _style12_property("_extra1", 31)
+    extra2 = _style12_property("_extra2", 32)
 
     def __init__(self, style12):
-        self.props = {}
-        for name, val in zip(config.STYLE12, style12.split(" ")):
-            try:
-                val = int(val)
-            except ValueError:
-                pass
-            self.props[name] = val
-
-        self.halfmove = (2 * (self.props["next_move_number"] - 1) +
-                         (self.props["next_color"] == "B"))
-        self.board = {
-            "{0}{1}".format(coord, number): symbol
-            for number in range(1, 9)
-            for coord, symbol in zip("abcdefgh", self.props[number])
-            if symbol != "-"}
-        self.props["sf_move"] = notation_to_sf_move(
-            self.props["notation"], switch_color(self.props["next_color"]))
+        self.set_style12(style12)
+
+    def set_style12(self, style12):
+        """Fill the position from a style12 line
+            the fields are split once and the board and numeric fields are
+            read by position; names, timings and extras are kept as text
+            and decoded on access"""
+        fields = style12.split(" ")
+        try:
+            # rows are listed from 8 to 1, the board starts at a1
+            rows = "".join(reversed(fields[1:9]))
+            self.board = [None if symbol == "-" else symbol
+                          for symbol in rows]
+            self.kings = {"W": rows.find("K"), "B": rows.find("k")}
+            for color, king in self.kings.items():
+                if king < 0:
+                    self.kings[color] = None
+
+            self.next_color = fields[9]
+            self.double_pawn_move = int(fields[10])
+            self.castling = (
+                (fields[11] == "1") * WHITE_SHORT |
+                (fields[12] == "1") * WHITE_LONG |
+                (fields[13] == "1") * BLACK_SHORT |
+                (fields[14] == "1") * BLACK_LONG)
+            self.moves_irreversible = int(fields[15])
+            self.game_number = int(fields[16])
+            self.relation = int(fields[19])
+            self.white_material = int(fields[22])
+            self.black_material = int(fields[23])
+            self.white_time = int(fields[24])
+            self.black_time = int(fields[25])
+            self.next_move_number = int(fields[26])
+            self._notation = fields[27]
+            self._last_move_short = fields[29]
+            self.orientation = int(fields[30])
+        except (IndexError, ValueError):
+            raise PyficsError("Invalid style12: {0}".format(style12))
+
+        if len(self.board) != 64:
+            raise PyficsError("Invalid style12: {0}".format(style12))
+
+        self._fields = fields
+        self._shared = False
+        self._board_key = self._fen = None
+        # the line itself is the serialization, if it has no extra fields
+        self._style12 = style12 if len(fields) == len(config.STYLE12) else None
+        self._white_name = self._black_name = None
+        self._initial_time = self._increment = self._move_time = None
+        self._extra1 = self._extra2 = None
+
+        self.last_move = None
+        self._sf_move = None
+        self.halfmove = (2 * (self.next_move_number - 1) +
+                         (self.next_color == "B"))
+        self.key = self.get_key()
+
+    def get_notation(self):
+        """Fics notation of the last move"""
+        return "none" if self.last_move is None else self.last_move.notation
+
+    def get_last_move_short(self):
+        """Short notation of the last move, with "+" for check"""
+        if self.last_move is None:
+            return "none"
+        return self.last_move.short + ("+" if self.is_check(True) else "")
+
+    def get_sf_move(self):
+        """Stockfish notation of the last move"""
+        if self.last_move is None:
+            return notation_to_sf_move(
+                self.notation, switch_color(self.next_color))
+        return self.last_move.sf_move
+
+    notation = _last_move_property("_notation", get_notation)
+    last_move_short = _last_move_property(
+        "_last_move_short", get_last_move_short)
+    sf_move = _last_move_property("_sf_move", get_sf_move)
+
+    def get_key(self):
+        """Calculate the zobrist key of the position from scratch"""
+        key = ZOBRIST_CASTLING[self.castling] ^ ZOBRIST_ENPASSANT[
+            self.double_pawn_move]
+        if self.next_color == "B":
+            key ^= ZOBRIST_BLACK
+        for index, symbol in enumerate(self.board):
+            if symbol is not None:
+                key ^= ZOBRIST_PIECES[symbol][index]
+        return key
+
+    def touch(self):
+        """Forget the cached fen and style12 after changing the position"""
+        self._board_key = self._fen = self._style12 = None
+
+    def copy(self):
+        """Return a copy which shares the board until either one changes"""
+        position = Position.__new__(Position)
+        for name in Position.__slots__:
+            setattr(position, name, getattr(self, name))
+        position.kings = dict(self.kings)
+        self._shared = position._shared = True
+        return position
+
+    def own_board(self):
+        """Take a private copy of a board shared by copy()"""
+        if self._shared:
+            self.board = list(self.board)
+            self._shared = False
+
+    def set_square(self, index, symbol):
+        """Put symbol (None: empty) on the square with index"""
+        self.own_board()
+        board = self.board
+        if board[index] is not None:
+            self.key ^= ZOBRIST_PIECES[board[index]][index]
+            if board[index] in "Kk":
+                self.kings[get_color(board[index])] = None
+        board[index] = symbol
+        if symbol is not None:
+            self.key ^= ZOBRIST_PIECES[symbol][index]
+            if symbol in "Kk":
+                self.kings[get_color(symbol)] = index
+        self.touch()
+
+    def get_pieces(self):
+        """Return the board as a dict of square -> symbol"""
+        return {SQUARES[index]: symbol
+                for index, symbol in enumerate(self.board)
+                if symbol is not None}
 
     def check_move(self, move, check=True):
         """Check if the proposed move is legal"""
 
-        if move["color"] != self.props["next_color"]:
+        color = move.color
+        if color != self.next_color:
             raise PyficsError("{0} is to move".format(
-                "White" if move["color"] == "B" else "Black"))
+                "White" if color == "B" else "Black"))
 
-        if not (move["squares"][0] in self.board and
-                self.board[move["squares"][0]] == move["symbol"]):
+        if self.board[move.start] != move.symbol:
             raise PyficsError(
                 "No piece {0} on {1}".format(
-                    move["symbol"], move["squares"][0]))
-
-        if ("squares2" in move and not (
-                move["squares2"][0] in self.board and
-                self.board[move["squares2"][0]] == move["symbol2"])):
-            raise PyficsError(
-                "No piece {0} on {1}".format(
-                    move["symbol2"], move["squares2"][0]))
-
-        if "taken" in move:
-            color_taken = get_color(move["taken"])
-            if color_taken == move["color"]:
+                    move.symbol, SQUARES[move.start]))
+
+        if move.flags & CASTLE:
+            rook_start = move.rook[0]
+            if self.board[rook_start] != PIECES[color][3]:
+                raise PyficsError(
+                    "No piece {0} on {1}".format(
+                        PIECES[color][3], SQUARES[rook_start]))
+
+        if move.taken is not None:
+            color_taken = get_color(move.taken)
+            if color_taken == color:
                 raise PyficsError("Cannot eat own color")
 
+        if move.flags & CASTLE:
+            self.check_castle(move.notation)
+
         self.check_movement(move)
         self.check_blocking(move)
 
-        # add "+" to short notation if checked
+        # test on the position itself, and restore it afterwards
         if check:
-            new_position = copy.deepcopy(self)
-            new_position.make_move(move)
-            if new_position.is_check():
+            undo = self.make_move(move)
+            checked = self.is_check()
+            self.unmake_move(move, undo)
+            if checked:
                 raise PyficsError("You're checked")
 
+    def check_castle(self, notation):
+        """Check if the side to move can castle"""
+        flag, _king_start, _king_end, empty, path = CASTLES[
+            self.next_color, notation]
+        other_color = switch_color(self.next_color)
+        if not self.castling & flag:
+            raise PyficsError("No castling rights left")
+        for index in empty:
+            if self.board[index] is not None:
+                raise PyficsError(
+                    "Piece is blocking on {0}".format(SQUARES[index]))
+        for index in path:
+            if self.is_attacked(index, other_color):
+                raise PyficsError(
+                    "Cannot castle through check on {0}".format(
+                        SQUARES[index]))
+
+    def can_castle(self, notation):
+        """Is castling allowed for the side to move"""
+        try:
+            self.check_castle(notation)
+        except PyficsError:
+            return False
+        return True
+
     @staticmethod
     def check_movement(move):
         """Check if the piece moves according to its characteristics"""
 
-        if (move["letter"] == "B" and
-                not (move["col_start"] + move["row_start"] ==
-                     move["col_end"] + move["row_end"] or
-                     move["col_start"] - move["row_start"] ==
-                     move["col_end"] - move["row_end"])):
+        # rows and cols as seen by the player, 0..7
+        row_start, col_start = divmod(move.start, 8)
+        row_end, col_end = divmod(move.end, 8)
+        if move.color == "B":
+            row_start, col_start = 7 - row_start, 7 - col_start
+            row_end, col_end = 7 - row_end, 7 - col_end
+        letter = move.letter
+
+        if (letter == "B" and
+                not (col_start + row_start == col_end + row_end or
+                     col_start - row_start == col_end - row_end)):
             raise PyficsError("Illegal bishop move")
-        elif (move["letter"] == "R" and
-              not (move["col_start"] == move["col_end"] or
-                   move["row_start"] == move["row_end"])):
+        elif (letter == "R" and
+              not (col_start == col_end or row_start == row_end)):
             raise PyficsError("Illegal rook move")
-        elif (move["letter"] == "N" and
-              not ((abs(move["col_end"] - move["col_start"]),
-                    abs(move["row_end"] - move["row_start"])) in
+        elif (letter == "N" and
+              not ((abs(col_end - col_start), abs(row_end - row_start)) in
                    [(1, 2), (2, 1)])):
             raise PyficsError("Illegal knight move")
-        elif (move["letter"] == "K" and
-              "squares2" not in move and  # exclude rocade
-              not (abs(move["col_end"] - move["col_start"]) <= 1 and
-                   abs(move["row_end"] - move["row_start"]) <= 1)):
+        elif (letter == "K" and
+              not move.flags & CASTLE and
+              not (abs(col_end - col_start) <= 1 and
+                   abs(row_end - row_start) <= 1)):
             raise PyficsError("Illegal king move")
-        elif (move["letter"] == "Q" and
-              not (move["col_start"] + move["row_start"] ==
-                   move["col_end"] + move["row_end"] or
-                   move["col_start"] - move["row_start"] ==
-                   move["col_end"] - move["row_end"] or
-                   move["col_start"] == move["col_end"] or
-                   move["row_start"] == move["row_end"])):
+        elif (letter == "Q" and
+              not (col_start + row_start == col_end + row_end or
+                   col_start - row_start == col_end - row_end or
+                   col_start == col_end or
+                   row_start == row_end)):
             raise PyficsError("Illegal queen move")
-        elif move["letter"] == "P":
+        elif letter == "P":
             # pawn capture
-            if "enpassant" in move:
+            if move.flags & ENPASSANT:
                 pass
-            elif "taken" in move:
-                if not (move["row_end"] - move["row_start"] == 1 and
-                        abs(move["col_start"] - move["col_end"]) == 1):
+            elif move.taken is not None:
+                if not (row_end - row_start == 1 and
+                        abs(col_start - col_end) == 1):
                     raise PyficsError("Illegal pawn capture")
             else:
-                if not (move["col_start"] == move["col_end"] and (
-                        (move["row_end"] - move["row_start"] == 1) or
-                        (move["row_end"] == 4 and move["row_start"] == 2))):
+                if not (col_start == col_end and (
+                        (row_end - row_start == 1) or
+                        (row_end == 3 and row_start == 1))):
                     raise PyficsError("Illegal pawn move")
 
     def check_blocking(self, move):
         """Check if pieces are blocking the way"""
-        if move["letter"] == "N":
+        if move.letter == "N":
             return
 
-        col_range = (range(move["col_start"] + 1, move["col_end"])
-                     if move["col_end"] > move["col_start"] else
-                     range(move["col_start"] - 1, move["col_end"], -1))
-        row_range = (range(move["row_start"] + 1, move["row_end"])
-                     if move["row_end"] > move["row_start"] else
-                     range(move["row_start"] - 1, move["row_end"], -1))
-        if move["row_start"] == move["row_end"]:
-            fields = [(move["row_start"], col) for col in col_range]
-        elif move["col_start"] == move["col_end"]:
-            fields = [(row, move["col_start"]) for row in row_range]
-        else:
-            fields = zip(row_range, col_range)
-        for row, col in fields:
-            square = rowcol_to_square(row, col, move["color"])
-            if square in self.board:
-                raise PyficsError("Piece is blocking on {0}".format(square))
+        start, end = move.start, move.end
+        row_step = (end >> 3 > start >> 3) - (end >> 3 < start >> 3)
+        col_step = (end & 7 > start & 7) - (end & 7 < start & 7)
+        step = 8 * row_step + col_step
+        for index in range(start + step, end, step):
+            if self.board[index] is not None:
+                raise PyficsError(
+                    "Piece is blocking on {0}".format(SQUARES[index]))
 
     def make_move(self, move):
-        """Make a move and update style12"""
-
-        self.props["notation"] = move["notation"]
-        self.props["last_move_short"] = move["short"]
-        self.props["sf_move"] = move["sf_move"]
-
-        self.props["next_color"] = switch_color(self.props["next_color"])
-        if self.props["relation"] in (1, -1):
-            self.props["relation"] *= -1
-
-        # castle
-        if "h1" in move["squares"] or "e1" in move["squares"]:
-            self.props["white_castle_short"] = 0
-        if "a1" in move["squares"] or "e1" in move["squares"]:
-            self.props["white_castle_long"] = 0
-        if "h8" in move["squares"] or "e8" in move["squares"]:
-            self.props["black_castle_short"] = 0
-        if "a8" in move["squares"] or "e8" in move["squares"]:
-            self.props["black_castle_long"] = 0
-
-        self.props["double_pawn_move"] = (
-            "abcdefgh".index(move["squares"][0][0])
-            if (move["letter"] == "P" and
-                abs(int(move["squares"][1][1]) -
-                    int(move["squares"][0][1])) == 2) else
+        """Make a move and update style12
+            return the undo record for unmake_move"""
+
+        self.own_board()
+        board = self.board
+        start, end, symbol, taken, promotion, flags = move
+        undo = (self.last_move, self._notation, self._last_move_short,
+                self._sf_move, self.relation, self.castling,
+                self.double_pawn_move, self.moves_irreversible,
+                self.white_material, self.black_material, board[end],
+                self.key, self._board_key, self._fen, self._style12)
+
+        # remove the old castling and en passant state from the key
+        key = (self.key ^ ZOBRIST_BLACK ^
+               ZOBRIST_CASTLING[self.castling] ^
+               ZOBRIST_ENPASSANT[self.double_pawn_move])
+
+        # the notations are derived when asked for
+        self.last_move = move
+        self._notation = self._last_move_short = self._sf_move = None
+        self._board_key = self._fen = self._style12 = None
+
+        color = self.next_color
+        self.next_color = switch_color(color)
+        if self.relation in (1, -1):
+            self.relation *= -1
+
+        self.castling &= CASTLE_MASKS[start] & CASTLE_MASKS[end]
+
+        self.double_pawn_move = (
+            start & 7
+            if (symbol in "Pp" and abs(end - start) == 16) else
             0-1)  # pep8 cannot start with -
 
-        self.props["moves_irreversible"] = (
-            0 if move["letter"] == "P" or "taken" in move else
-            1)
+        if symbol in "Pp" or taken is not None:
+            self.moves_irreversible = 0
+        else:
+            self.moves_irreversible += 1
 
-        if move["color"] == "B":
-            self.props["next_move_number"] += 1
+        if color == "B":
+            self.next_move_number += 1
 
         # capture piece
-        if "taken" in move:
-            self.props["{0}_material".format(
-                "black" if move["color"] == "W" else "white")] -= (
-                    config.PIECE_VALUE[move["taken"].upper()])
-
-        if "promotion" in move:
-            self.props["{0}_material".format(
-                "black" if move["color"] == "B" else "white")] += (
-                    config.PIECE_VALUE[move["promotion"].upper()] - 1)
-
-        self.board[move["squares"][1]] = self.board.pop(move["squares"][0])
-        if "squares2" in move:
-            self.board[move["squares2"][1]] = self.board.pop(
-                move["squares2"][0])
-        if "enpassant" in move:
-            del self.board[move["enpassant"]]
-        if "promotion" in move:
-            self.board[move["squares"][1]] = move["promotion"]
-
-        # this has to be done after board update
-        if self.is_check(True):
-            self.props["last_move_short"] += "+"
-        self.halfmove += 1
+        if taken is not None:
+            if color == "W":
+                self.black_material -= config.PIECE_VALUE[taken.upper()]
+            else:
+                self.white_material -= config.PIECE_VALUE[taken.upper()]
 
-    def is_check(self, switch=False):
-        """In the current position, is color checked"""
-
-        if switch:
-            new_position = copy.deepcopy(self)
-            new_position.props["next_color"] = switch_color(
-                new_position.props["next_color"])
-            return new_position.is_check()
-
-        checked_color = switch_color(self.props["next_color"])
-        king = "K" if checked_color == "W" else "k"
-        king_pos = [square for square, symbol in self.board.items()
-                    if symbol == king][0]
-        for square, symbol in self.board.items():
-            notation = "{0}/{1}-{2}".format(symbol.upper(), square, king_pos)
-            try:
-                move = self.notation_to_move(notation)
-                self.check_move(move, check=False)
+        if promotion is not None:
+            if color == "W":
+                self.white_material += config.PIECE_VALUE[
+                    promotion.upper()] - 1
+            else:
+                self.black_material += config.PIECE_VALUE[
+                    promotion.upper()] - 1
+
+        key ^= (ZOBRIST_CASTLING[self.castling] ^
+                ZOBRIST_ENPASSANT[self.double_pawn_move])
+
+        if board[end] is not None:
+            key ^= ZOBRIST_PIECES[board[end]][end]
+        key ^= ZOBRIST_PIECES[symbol][start]
+        board[end] = promotion if promotion is not None else symbol
+        board[start] = None
+        key ^= ZOBRIST_PIECES[board[end]][end]
+        if flags & CASTLE:
+            rook_start, rook_end = ROOK_CASTLES[end]
+            rook = board[rook_start]
+            key ^= (ZOBRIST_PIECES[rook][rook_start] ^
+                    ZOBRIST_PIECES[rook][rook_end])
+            board[rook_end] = rook
+            board[rook_start] = None
+        elif flags & ENPASSANT:
+            enpassant = move.enpassant
+            key ^= ZOBRIST_PIECES[taken][enpassant]
+            board[enpassant] = None
+        self.key = key
+        if symbol in "Kk":
+            self.kings[color] = end
+
+        self.halfmove += 1
+        return undo
+
+    def unmake_move(self, move, undo):
+        """Take back a move made by make_move, using its undo record"""
+
+        self.own_board()
+        (self.last_move, self._notation, self._last_move_short,
+         self._sf_move, self.relation, self.castling,
+         self.double_pawn_move, self.moves_irreversible,
+         self.white_material, self.black_material, taken,
+         self.key, self._board_key, self._fen, self._style12) = undo
+
+        start, end, symbol, _taken, _promotion, flags = move
+        color = switch_color(self.next_color)
+        self.next_color = color
+        if color == "B":
+            self.next_move_number -= 1
+        self.halfmove -= 1
+
+        board = self.board
+        board[start] = symbol
+        board[end] = taken
+        if flags & CASTLE:
+            rook_start, rook_end = ROOK_CASTLES[end]
+            board[rook_start] = board[rook_end]
+            board[rook_end] = None
+        elif flags & ENPASSANT:
+            board[move.enpassant] = move.taken
+        if symbol in "Kk":
+            self.kings[color] = start
+
+    def attackers_of(self, square, color):
+        """Return the squares of the pieces of color attacking square"""
+        board = self.board
+        pawn, knight, bishop, rook, queen, king = PIECES[color]
+
+        attackers = [index for index in KNIGHT_ATTACKS[square]
+                     if board[index] == knight]
+        attackers.extend(index for index in KING_ATTACKS[square]
+                         if board[index] == king)
+        # a pawn of color on index attacks square if
+        # a pawn of the other color on square attacks index
+        attackers.extend(index for index in
+                         PAWN_ATTACKS[switch_color(color)][square]
+                         if board[index] == pawn)
+        for rays, slider in ((ROOK_RAYS, rook), (BISHOP_RAYS, bishop)):
+            for ray in rays[square]:
+                for index in ray:
+                    symbol = board[index]
+                    if symbol is not None:
+                        if symbol == slider or symbol == queen:
+                            attackers.append(index)
+                        break
+        return attackers
+
+    def is_attacked(self, square, color):
+        """Is square attacked by any piece of color"""
+        board = self.board
+        pawn, knight, bishop, rook, queen, king = PIECES[color]
+
+        for index in KNIGHT_ATTACKS[square]:
+            if board[index] == knight:
                 return True
-            except PyficsError:
-                pass
+        for index in KING_ATTACKS[square]:
+            if board[index] == king:
+                return True
+        for index in PAWN_ATTACKS[switch_color(color)][square]:
+            if board[index] == pawn:
+                return True
+        for rays, slider in ((ROOK_RAYS, rook), (BISHOP_RAYS, bishop)):
+            for ray in rays[square]:
+                for index in ray:
+                    symbol = board[index]
+                    if symbol is not None:
+                        if symbol == slider or symbol == queen:
+                            return True
+                        break
         return False
 
+    def is_check(self, switch=False):
+        """In the current position, is color checked
+            switch: test the side to move instead"""
+
+        checked_color = (self.next_color if switch else
+                         switch_color(self.next_color))
+        king = self.kings[checked_color]
+        return (king is not None and
+                self.is_attacked(king, switch_color(checked_color)))
+
+    def pseudo_moves(self):
+        """Return the (start, end, promotion) of all moves,
+            ignoring checks on the own king"""
+        # (too many branches) pylint: disable=R0912
+        board = self.board
+        color = self.next_color
+        own = PIECES[color]
+        pawn, knight, bishop, rook, queen, king = own
+        moves = []
+
+        for start, symbol in enumerate(board):
+            if symbol is None or symbol not in own:
+                continue
+            if symbol == pawn:
+                forward, first_row, last_row = (
+                    (8, 1, 7) if color == "W" else (-8, 6, 0))
+                ends = []
+                end = start + forward
+                if board[end] is None:
+                    ends.append(end)
+                    if (start >> 3 == first_row and
+                            board[end + forward] is None):
+                        ends.append(end + forward)
+                ends.extend(end for end in PAWN_ATTACKS[color][start]
+                            if board[end] is not None and
+                            board[end] not in own)
+                if self.double_pawn_move >= 0:
+                    target = (40 if color == "W" else 16) + \
+                        self.double_pawn_move
+                    if target in PAWN_ATTACKS[color][start]:
+                        ends.append(target)
+                for end in ends:
+                    if end >> 3 == last_row:
+                        moves.extend((start, end, promotion)
+                                     for promotion in (queen, rook,
+                                                       bishop, knight))
+                    else:
+                        moves.append((start, end, None))
+                continue
+
+            if symbol == knight or symbol == king:
+                table = KNIGHT_ATTACKS if symbol == knight else KING_ATTACKS
+                moves.extend((start, end, None) for end in table[start]
+                             if board[end] is None or board[end] not in own)
+                continue
+
+            rays = (ROOK_RAYS[start] if symbol == rook else
+                    BISHOP_RAYS[start] if symbol == bishop else
+                    ROOK_RAYS[start] + BISHOP_RAYS[start])
+            for ray in rays:
+                for end in ray:
+                    if board[end] is None:
+                        moves.append((start, end, None))
+                    else:
+                        if board[end] not in own:
+                            moves.append((start, end, None))
+                        break
+
+        for notation in ("o-o", "o-o-o"):
+            _flag, king_start, king_end, _empty, _path = CASTLES[
+                color, notation]
+            if board[king_start] == king and self.can_castle(notation):
+                moves.append((king_start, king_end, None))
+        return moves
+
+    def create_move(self, start, end, promotion=None, symbol=None):
+        """Return the move of the piece (symbol) on start to end"""
+        board = self.board
+        if symbol is None:
+            symbol = board[start]
+            if symbol is None:
+                raise PyficsError(
+                    "No piece to move on {0}".format(SQUARES[start]))
+        taken = board[end]
+        flags = 0
+        if (symbol, start, end) in KING_CASTLES:
+            flags = CASTLE
+        elif (symbol in "Pp" and taken is None and
+              abs((start & 7) - (end & 7)) == 1 and
+              end & 7 == self.double_pawn_move and
+              start >> 3 == (4 if symbol == "P" else 3) and
+              end >> 3 == (5 if symbol == "P" else 2)):
+            flags = ENPASSANT
+            taken = board[end - 8 if symbol == "P" else end + 8]
+        return Move(start, end, symbol, taken, promotion, flags)
+
+    def legal_moves(self):
+        """Generate all legal moves of the side to move"""
+        for start, end, promotion in self.pseudo_moves():
+            move = self.create_move(start, end, promotion)
+            undo = self.make_move(move)
+            checked = self.is_check()
+            self.unmake_move(move, undo)
+            if not checked:
+                yield move
+
     def clicks_to_notation(self, clicks):
         """Return notation based on the clicks"""
         clicks = tuple(clicks)
-        if clicks[0] in self.board:
-            symbol = self.board[clicks[0]]
-        else:
+        symbol = self.board[SQUARE_INDEX[clicks[0]]]
+        if symbol is None:
             raise PyficsError("No piece to move on %s" % clicks[0])
 
         if symbol.upper() == "K" and clicks in [("e1", "g1"), ("e8", "g8")]:
@@ -314,150 +865,226 @@ class Position(object):
                 notation += "=%s" % config.PROMOTION
         return notation
 
+    def get_board_key(self):
+        """Return the board as 64 symbols (- for empty) from a1 to h8,
+            usable as a dict key for the piece placement"""
+        if self._board_key is None:
+            self._board_key = "".join(
+                symbol or "-" for symbol in self.board)
+        return self._board_key
+
+    def get_row(self, number):
+        """Return row (1..8) as in style12, with - for empty squares"""
+        offset = 8 * (number - 1)
+        return self.get_board_key()[offset:offset + 8]
+
     def get_style12(self):
         """return style12_string"""
-
-        # convert position to rows
-        for number in range(1, 9):
-            self.props[number] = ""
-            for letter in "abcdefgh":
-                square = "{0}{1}".format(letter, number)
-                if square in self.board:
-                    self.props[number] += self.board[square]
-                else:
-                    self.props[number] += "-"
-        return " ".join(["%s" % self.props[key] for key in config.STYLE12])
+        if self._style12 is not None:
+            return self._style12
+        values = []
+        for key in config.STYLE12:
+            if key == "style12":
+                values.append("<12>")
+            elif isinstance(key, int):
+                values.append(self.get_row(key))
+            else:
+                values.append("%s" % getattr(self, key))
+        self._style12 = " ".join(values)
+        return self._style12
 
     def get_fen(self):
         """Return fen string"""
+        if self._fen is not None:
+            return self._fen
         fens = []
 
-        lines = []
-        for number in range(8, 0, -1):
-            line = ""
-            for letter in "abcdefgh":
-                square = "{0}{1}".format(letter, number)
-                line += self.board[square] if square in self.board else "-"
-            lines.append(line)
-        board = "/".join(lines)
+        board = "/".join(self.get_row(number) for number in range(8, 0, -1))
         board = re.sub("(-+)", lambda match: str(len(match.group())), board)
         fens.append(board)
 
-        fens.append(self.props["next_color"].lower())
+        fens.append(self.next_color.lower())
 
-        castle = (
-            "K" if self.props["white_castle_short"] else "" +
-            "Q" if self.props["white_castle_long"] else "" +
-            "k" if self.props["black_castle_short"] else "" +
-            "q" if self.props["black_castle_long"] else "")
-        if castle == "":
-            castle = "-"
-        fens.append(castle)
+        castle = "".join(
+            letter for letter, flag in zip(
+                "KQkq", (WHITE_SHORT, WHITE_LONG, BLACK_SHORT, BLACK_LONG))
+            if self.castling & flag)
+        fens.append(castle or "-")
 
-        if self.props["double_pawn_move"] >= 0:
-            letter = "abcdefgh"[self.props["double_pawn_move"]]
+        if self.double_pawn_move >= 0:
+            letter = "abcdefgh"[self.double_pawn_move]
             square = (
-                "{0}6".format(letter) if self.props["next_color"] == "W" else
+                "{0}6".format(letter) if self.next_color == "W" else
                 "{0}3".format(letter))
         else:
             square = "-"
         fens.append(square)
 
-        fens.append(str(self.props["moves_irreversible"]))
-        fens.append(str(self.props["next_move_number"]))
+        fens.append(str(self.moves_irreversible))
+        fens.append(str(self.next_move_number))
 
-        return " ".join(fens)
+        self._fen = " ".join(fens)
+        return self._fen
 
     def get_board(self):
         """ASCII board"""
         lines = []
         for number in range(8, 0, -1):
             lines.append(33 * "-")
-            line = "|"
-            for letter in "abcdefgh":
-                square = "{0}{1}".format(letter, number)
-                line += " {0} |".format(
-                    self.board[square] if square in self.board else
-                    " ")
-            lines.append(line)
+            lines.append("|" + "".join(
+                " {0} |".format(symbol or " ")
+                for symbol in self.board[8 * (number - 1):8 * number]))
         lines.append(33 * "-")
         return "\n".join(lines)
 
     def notation_to_move(self, notation):
-        """Transform the notation to the actual moves to be excecuted"""
+        """Transform the notation to the actual move to be excecuted"""
 
-        move = {"notation": notation}
         if notation == "none":
-            return move
-
-        move["color"] = self.props["next_color"]
-        if notation == "o-o" and move["color"] == "W":
-            move["squares"] = ["e1", "g1"]
-            move["symbol"] = "K"
-            move["squares2"] = ["h1", "f1"]
-            move["symbol2"] = "R"
-        elif notation == "o-o" and move["color"] == "B":
-            move["squares"] = ["e8", "g8"]
-            move["symbol"] = "k"
-            move["squares2"] = ["h8", "f8"]
-            move["symbol2"] = "r"
-        elif notation == "o-o-o" and move["color"] == "W":
-            move["squares"] = ["e1", "c1"]
-            move["symbol"] = "K"
-            move["squares2"] = ["a1", "d1"]
-            move["symbol2"] = "R"
-        elif notation == "o-o-o" and move["color"] == "B":
-            move["squares"] = ["e8", "c8"]
-            move["symbol"] = "k"
-            move["squares2"] = ["a8", "d8"]
-            move["symbol2"] = "r"
+            raise PyficsError("No move")
+
+        color = self.next_color
+        if notation in ("o-o", "o-o-o"):
+            _flag, start, end, _empty, _path = CASTLES[color, notation]
+            return self.create_move(start, end, symbol=PIECES[color][5])
+
+        letter, squares = notation.split("/")
+        squares = re.split("-|=", squares)
+        # a possible promotion piece, get 3rd place in moves
+        promotion = None
+        if len(squares) == 3:
+            promotion = (squares[2].upper() if color == "W" else
+                         squares[2].lower())
+        return self.create_move(
+            SQUARE_INDEX[squares[0]], SQUARE_INDEX[squares[1]], promotion,
+            letter.upper() if color == "W" else letter.lower())
+
+    def is_legal(self, move):
+        """Does move not leave the own king in check"""
+        undo = self.make_move(move)
+        checked = self.is_check()
+        self.unmake_move(move, undo)
+        return not checked
+
+    def san_to_move(self, san):
+        """Transform standard algebraic notation (Nbxd2, O-O) to a move"""
+        color = self.next_color
+        san = san.rstrip("+#!?")
+        if san in ("O-O", "0-0", "O-O-O", "0-0-0"):
+            return self.notation_to_move("o-o" if len(san) == 3 else "o-o-o")
+        match = SAN_REGEX.match(san)
+        if match is None:
+            raise PyficsError("Invalid move: {0}".format(san))
+        letter, col, row, square, promotion = match.groups()
+        end = SQUARE_INDEX[square]
+        if promotion is not None and color == "B":
+            promotion = promotion.lower()
+
+        board = self.board
+        if letter is None:
+            pawn = PIECES[color][0]
+            step = 8 if color == "W" else -8
+            if col is None or col == square[0]:
+                start = end - step
+                if 0 <= start < 64 and board[start] is None:
+                    start -= step
+            else:
+                start = SQUARE_INDEX[col + square[1]] - step
+            if not 0 <= start < 64:
+                raise PyficsError("Invalid move: {0}".format(san))
+            # a pawn promotes on the last row, and only there
+            if (promotion is None) == (end >> 3 == (7 if color == "W" else 0)):
+                raise PyficsError("Invalid promotion: {0}".format(san))
+            starts = [start] if board[start] == pawn else []
         else:
-            letter, squares = re.split("/", notation)
-            move["symbol"] = letter if move["color"] == "W" else letter.lower()
-
-            squares = re.split("-|=", squares)
-
-            # a possible promotion piece, get 3rd place in moves
-            if len(squares) == 3:
-                move["promotion"] = squares.pop()
-            move["squares"] = squares
-
-        move["letter"] = move["symbol"].upper()
-        move["row_start"], move["col_start"] = square_to_rowcol(
-            move["squares"][0], move["color"])
-        move["row_end"], move["col_end"] = square_to_rowcol(
-            move["squares"][1], move["color"])
-
-        if (move["letter"] == "P" and
-                move["row_start"] == 5 and move["row_end"] == 6 and
-                abs(move["col_end"] - move["col_start"]) == 1 and
-                "abcdefgh".index(move["squares"][1][0]) ==
-                self.props["double_pawn_move"]):
-            move["enpassant"] = rowcol_to_square(
-                5, move["col_end"], move["color"])
-            move["taken"] = self.board[move["enpassant"]]
-
-        if move["squares"][1] in self.board:
-            move["taken"] = self.board[move["squares"][1]]
-
-        move["short"] = get_short_move(notation, move)
-        move["sf_move"] = notation_to_sf_move(notation, move["color"])
-        return move
+            symbol = letter if color == "W" else letter.lower()
+            starts = [index for index in self.attackers_of(end, color)
+                      if board[index] == symbol and
+                      (col is None or SQUARES[index][0] == col) and
+                      (row is None or SQUARES[index][1] == row)]
+
+        moves = [move for move in (self.create_move(start, end, promotion)
+                                   for start in starts)
+                 if self.is_legal(move)]
+        if len(moves) != 1:
+            raise PyficsError("Invalid move: {0}".format(san))
+        if letter is None:
+            # the pieces are found by attackers_of, a pawn may still push
+            # onto a piece or take on an empty square
+            self.check_move(moves[0], check=False)
+        return moves[0]
+
+    def get_san(self, move):
+        """Standard algebraic notation of a legal move, with + or #"""
+        start, end, symbol, taken, promotion, flags = move
+        if flags & CASTLE:
+            san = "O-O" if end > start else "O-O-O"
+        elif symbol in "Pp":
+            san = ("{0}x{1}".format(SQUARES[start][0], SQUARES[end])
+                   if taken is not None else SQUARES[end])
+            if promotion is not None:
+                san += "=" + promotion.upper()
+        else:
+            # name the column, the row or both if another piece can go there
+            others = [SQUARES[index] for index in
+                      self.attackers_of(end, get_color(symbol))
+                      if index != start and self.board[index] == symbol and
+                      self.is_legal(self.create_move(index, end))]
+            square = SQUARES[start]
+            origin = (
+                "" if not others else
+                square[0] if all(other[0] != square[0] for other in others)
+                else square[1] if all(other[1] != square[1]
+                                      for other in others)
+                else square)
+            san = "{0}{1}{2}{3}".format(
+                symbol.upper(), origin, "x" if taken is not None else "",
+                SQUARES[end])
+
+        undo = self.make_move(move)
+        if self.is_check(True):
+            san += "+" if any(True for _move in self.legal_moves()) else "#"
+        self.unmake_move(move, undo)
+        return san
+
+
+def perft(position, depth):
+    """Count the positions after depth halfmoves"""
+    if depth == 0:
+        return 1
+    nodes = 0
+    for move in position.legal_moves():
+        if depth == 1:
+            nodes += 1
+        else:
+            undo = position.make_move(move)
+            nodes += perft(position, depth - 1)
+            position.unmake_move(move, undo)
+    return nodes
 
 
 class Game(object):
-    """Holds the complete game"""
+    """Holds the complete game
+        the history is the list of moves with the clocks after each
+        halfmove; a full position is only kept every SNAPSHOT plies,
+        and where a position can not be reached by a move"""
     # (too many public methods) pylint: disable=R0904
 
+    SNAPSHOT = 16
+
     def __init__(self):
         self.setup()
 
-    def setup(self):
+    def setup(self, style12=config.START):
         """Reset the game"""
-        self.history = {}
-        self.moves = {}
-        self.info = collections.defaultdict(dict)
-        self.position = Position(config.START)
+        self.tags = collections.OrderedDict()  # pgn tags
+        # history[i] and moves[i] belong to halfmove first + i
+        self.first = 0
+        self.history = []  # (move, key, white_time, black_time)
+        self.moves = []  # stockfish notation of the move
+        self.snapshots = {}  # halfmove -> Position
+        self.info = collections.defaultdict(dict)  # zobrist key -> info
+        self.position = Position(style12)
         self.set_position()
 
     def clicks_to_notation(self, clicks):
@@ -474,18 +1101,40 @@ class Game(object):
 
     def get(self, key):
         """Get property from the current position"""
-        return (self.position.board if key == "board" else
-                self.position.halfmove if key == "halfmove" else
-                self.position.props[key])
+        return (self.position.get_pieces() if key == "board" else
+                getattr(self.position, key))
 
     def set_position(self, position=None):
         """Set the position and fill history"""
+        move = self.position.last_move
         if position is not None:
+            # a style12 position does not know its move, take it from
+            # the position when it is the one reached by make_move
+            if (position.halfmove != self.position.halfmove or
+                    position.key != self.position.key):
+                move = position.last_move
             self.position = position
 
         halfmove = self.position.halfmove
-        self.history[halfmove] = copy.deepcopy(self.position)
-        self.moves[halfmove] = self.get("sf_move")
+        index = halfmove - self.first
+        if not 0 <= index <= len(self.history):
+            # not connected to the history, start a new one
+            self.first, index = halfmove, 0
+            self.history, self.moves, self.snapshots = [], [], {}
+
+        # Delete the history from this halfmove on
+        for prev_halfmove in range(halfmove,
+                                   self.first + len(self.history)):
+            self.snapshots.pop(prev_halfmove, None)
+        del self.history[index:]
+        del self.moves[index:]
+
+        if move is None or index == 0 or halfmove % self.SNAPSHOT == 0:
+            self.snapshots[halfmove] = self.position.copy()
+        self.history.append((move, self.position.key,
+                             self.position.white_time,
+                             self.position.black_time))
+        self.moves.append(self.get("sf_move"))
 
 #         if halfmove in self.history:
 #             orig_style12 = self.history[halfmove].get_style12()
@@ -495,47 +1144,103 @@ class Game(object):
 #                     "Style12\nnew: {new}\norig: {orig}\n".format(
 #                         orig=orig_style12, new=new_style12))
 
-        # Delete previous history
-        for prev_halfmove in list(self.history.keys()):
-            if prev_halfmove > halfmove:
-                del self.history[prev_halfmove]
-                del self.moves[prev_halfmove]
+    def follow(self, position):
+        """Set a position received from fics, reached by its move when
+            it follows the current position; return that move, or None
+            when the position does not follow or the move does not
+            reach its board"""
+        move = None
+        if position.halfmove - 1 == self.position.halfmove:
+            try:
+                move = self.notation_to_move(position.notation)
+                self.check_move(move)
+                self.make_move(move)
+                if self.position.board != position.board:
+                    raise PyficsError("The move reaches another board")
+            except PyficsError as error:
+                logger.error("Cannot perform fics move {0}: {1}".format(
+                    position.notation, error))
+                move = None
+        self.set_position(position)
+        return move
 
     def make_move(self, move):
         """Make a move"""
-        logger.debug("make_move: {0}".format(move["notation"]))
+        logger.debug("make_move: {0}".format(move.notation))
         self.position.make_move(move)
         self.set_position()
 
     def get_history(self, halfmove):
-        """Return a previous position"""
-        return copy.deepcopy(self.history[halfmove])
+        """Return a previous position, replayed from the nearest snapshot
+            the board is shared with the snapshot until it is changed"""
+        start = halfmove
+        while start not in self.snapshots:
+            start -= 1
+        position = self.snapshots[start].copy()
+        for ply in self.history[start + 1 - self.first:
+                                halfmove + 1 - self.first]:
+            position.make_move(ply[0])
+        if start != halfmove:
+            _move, _key, position.white_time, position.black_time = (
+                self.history[halfmove - self.first])
+        return position
+
+    def trim(self, plies):
+        """Forget the history before the last plies halfmoves, to bound
+            the memory of a long followed game"""
+        drop = len(self.history) - plies
+        if drop <= 0:
+            return
+        first = self.first + drop
+        self.snapshots[first] = self.get_history(first)
+        for halfmove in range(self.first, first):
+            self.snapshots.pop(halfmove, None)
+        del self.history[:drop]
+        del self.moves[:drop]
+        self.first = first
 
     def get_halfmoves(self):
-        """Return all the moves in the history"""
-        return sorted(self.history.keys())
+        """Return all the moves in the history, as an ordered range"""
+        return range(self.first, self.first + len(self.history))
+
+    def get_sf_moves(self, halfmove):
+        """Return the stockfish notation of the moves up to halfmove"""
+        return self.moves[max(1 - self.first, 0):halfmove + 1 - self.first]
+
+    def get_key(self, halfmove):
+        """Return the zobrist key of a previous position"""
+        return self.history[halfmove - self.first][1]
+
+    def get_info(self, halfmove):
+        """Return the stockfish info of a previous position,
+            with pscore_prev from the move before (so we can color it)"""
+        halfmoves = self.get_halfmoves()
+        if halfmove not in halfmoves:
+            return {}
+        info = dict(self.info.get(self.get_key(halfmove), {}))
+        if halfmove - 1 in halfmoves:
+            prev_info = self.info.get(self.get_key(halfmove - 1), {})
+            if "pscore" in prev_info:
+                info["pscore_prev"] = prev_info["pscore"]
+        return info
 
     def update_info(self, info):
         """New stockfish info received
-            update previous scores and add prev_pscore"""
+            the info is stored by position, so it survives taking back
+            moves and is reused when a position is reached again"""
 
         halfmove = info["halfmove"]
         if "time" not in info:
             logger.debug("No time available in sf_info: {0}".format(info))
             # not a pv result
             return
-        if ("time" in self.info[halfmove] and
-                self.info[halfmove]["time"] > info["time"]):
+        key = info.get("key")
+        if key is None:
+            if halfmove not in self.get_halfmoves():
+                return
+            key = self.get_key(halfmove)
+        if ("time" in self.info[key] and
+                self.info[key]["time"] > info["time"]):
             return
-        self.info[halfmove].update(info)
-
-        # setting pscore_prev from previous move (so we can color it)
-        if "pscore" in self.info[halfmove - 1]:
-            self.info[halfmove]["pscore_prev"] = \
-                self.info[halfmove - 1]["pscore"]
-
-        # setting pscore_prev for next move (so we can color it)
-        self.info[halfmove + 1]["pscore_prev"] = info["pscore"]
-#         if "pscore" in self.info[halfmove + 1]:
-#             yield self.info[halfmove + 1]
+        self.info[key].update(info)
         return halfmove
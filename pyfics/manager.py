@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*-coding: utf-8-*-
+
+"""Many fics sessions in one event loop, to observe many games at once
+
+    every Session is a guest login with its own FicsClient, which
+    observes a part of the games; its style12 positions are routed by
+    game number through a GameRegistry, which trims every game to
+    max_plies halfmoves. The Manager runs the sessions, saves the
+    finished games and measures the time spent per message."""
+
+from __future__ import (division, absolute_import, unicode_literals,
+                        print_function)
+
+import time
+import asyncio
+import logging
+import collections
+
+from .client import FicsClient
+from .dispatch import Dispatcher
+from .game import Position
+from .registry import GameRegistry
+from .pgn import PgnWriter, fill_tags
+from .archive import Archive
+from .exceptions import PyficsError
+from . import config
+
+logger = logging.getLogger(__name__)
+
+MAX_PLIES = 600  # halfmoves kept of every followed game
+
+
+class Session(object):
+    """A guest login following the games it observes"""
+
+    def __init__(self, manager, number, commands=()):
+        self.manager = manager
+        self.number = number
+        self.commands = list(commands)  # sent when the session starts
+        self.client = FicsClient(config.SETTINGS["fics"]["server"],
+                                 config.SETTINGS["fics"]["port"],
+                                 config.SETTINGS["fics"]["read_size"])
+        self.games = GameRegistry(max_plies=manager.max_plies)
+        self.stats = collections.Counter()
+        self.dispatcher = Dispatcher.for_object(self)
+
+    async def run(self):
+        """Follow the games until the connection ends"""
+        await self.client.connect()
+        async for message in self.client:
+            start = time.perf_counter()
+            self.handle(message)
+            self.stats["messages"] += 1
+            self.stats["seconds"] += time.perf_counter() - start
+        logger.info("Session {0} disconnected".format(self.number))
+
+    def handle(self, message):
+        """Handle a fics message"""
+        self.dispatcher.dispatch(message)
+
+    def fics_login(self, _message, _match):
+        """Log in as guest"""
+        self.client.write("guest")
+
+    def fics_press_return(self, _message, _match):
+        """Enter the server as guest"""
+        self.client.write("")
+
+    def fics_session(self, message, _match):
+        """Logged in, set the fics parameters and observe"""
+        logger.info("Session {0}: {1}".format(self.number, message))
+        for command in ["set style 12", "set bell off"] + self.commands:
+            self.client.write(command)
+
+    def fics_style12(self, message, _match):
+        """A style12 position"""
+        self.style12(message)
+
+    def fics_result(self, _message, match):
+        """An observed game ended"""
+        self.finish(int(match.group("game_no")), match.group("result"))
+
+    def fics_removed(self, _message, match):
+        """An observed game was removed without a result"""
+        self.games.finish(int(match.group("game_no")))
+
+    def style12(self, line):
+        """Route a style12 position to the Game of its game number"""
+        try:
+            position = Position(line)
+        except PyficsError as error:
+            logger.error(error)
+            return
+        self.stats["positions"] += 1
+        self.games.update(position)
+
+    def finish(self, game_number, result):
+        """Save an observed game when it ended"""
+        game = self.games.finish(game_number)
+        if game is not None:
+            self.stats["games"] += 1
+            self.manager.save(game, result)
+
+
+class Manager(object):
+    """Run sessions and save the games they observe"""
+
+    def __init__(self, sessions=1, observe=(), commands=(),
+                 max_plies=MAX_PLIES):
+        self.max_plies = max_plies
+        observe = list(observe)
+        self.pgn = PgnWriter(config.PGN_FILE)
+        self.archive = Archive(config.ARCHIVE_FILE)
+        # the games to observe are spread over the sessions
+        self.sessions = [
+            Session(self, number, list(commands) + [
+                "observe {0}".format(game) for game in observe[
+                    number::sessions]])
+            for number in range(sessions)]
+
+    async def run(self):
+        """Run all sessions until they end"""
+        try:
+            results = await asyncio.gather(
+                *[session.run() for session in self.sessions],
+                return_exceptions=True)
+            for session, result in zip(self.sessions, results):
+                if isinstance(result, Exception):
+                    logger.error("Session {0} failed: {1}".format(
+                        session.number, result))
+        finally:
+            self.pgn.flush()
+
+    def close(self):
+        """Close all sessions"""
+        for session in self.sessions:
+            session.client.close()
+
+    def save(self, game, result):
+        """Write a finished game to the pgn file and the archive"""
+        fill_tags(game, result)
+        self.pgn.write(game)
+        self.archive.append(game)
+
+    def get_stats(self):
+        """The summed counters of the sessions, the number of followed
+            games and the microseconds spent per message"""
+        stats = collections.Counter()
+        for session in self.sessions:
+            stats.update(session.stats)
+            stats["followed"] += len(session.games)
+            stats["connected"] += session.client.connected
+        stats["usec_per_message"] = (1e6 * stats.pop("seconds", 0) /
+                                     max(stats["messages"], 1))
+        return dict(stats)
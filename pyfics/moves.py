@@ -26,7 +26,9 @@ class MovesTab(Gtk.VPaned):
         self.marks = {}
         stock_terminal, self.stock_buffer = self.get_terminal()
 
+        self.games_label = Gtk.Label("")
         stock_box = Gtk.VBox()
+        stock_box.pack_start(self.games_label, False, True, 0)
         stock_buttons = Gtk.HBox()
         self.enable_button = Gtk.CheckButton("Enable")
         stock_buttons.pack_start(self.enable_button, True, True, 0)
@@ -34,6 +36,8 @@ class MovesTab(Gtk.VPaned):
         stock_buttons.pack_start(self.show_button, True, True, 0)
         stock_box.pack_start(stock_buttons, False, True, 0)
         stock_box.pack_start(stock_terminal, True, True, 10)
+        explorer_terminal, self.explorer_buffer = self.get_terminal()
+        stock_box.pack_start(explorer_terminal, True, True, 0)
 
         self.show_stockfish = False
 
@@ -62,6 +66,13 @@ class MovesTab(Gtk.VPaned):
         if event.type == Gdk.EventType.BUTTON_RELEASE:
             self.emit("step", halfmove)
 
+    def set_game(self, game):
+        """Show the moves of another game, from its next move on"""
+        self.game = game
+        self.moves_buffer.set_text("")
+        self.tags = {}
+        self.marks = {}
+
     def update(self):
         """Add a move link"""
         halfmove = self.game.get("halfmove")
@@ -110,12 +121,10 @@ class MovesTab(Gtk.VPaned):
 
         if halfmove == self.halfmove:
             self.update_stockfish()
-        if (not self.show_stockfish or
-                halfmove not in self.tags or
-                halfmove not in self.game.info):
+        if not self.show_stockfish or halfmove not in self.tags:
             return
 
-        info = self.game.info[halfmove]
+        info = self.game.get_info(halfmove)
         if "pscore_prev" not in info or "pscore" not in info:
             return
         pscore_prev = info["pscore_prev"]
@@ -150,15 +159,27 @@ class MovesTab(Gtk.VPaned):
                 "underline", Pango.Underline.SINGLE)
         self.update_stockfish()
 
+    def set_games(self, scores):
+        """Show the scores of the saved games reaching the position"""
+        self.games_label.set_text(
+            "" if not scores["games"] else
+            "{games} games: +{win} ={draw} -{loss}".format(**scores))
+
+    def set_explorer(self, moves):
+        """Show the moves of the opening tree"""
+        self.explorer_buffer.set_text("\n".join(
+            "{san:7} {games:7d} {white:3.0f}% {draw:3.0f}% {black:3.0f}%"
+            " {rating}".format(**dict(move, rating=move["rating"] or ""))
+            for move in moves))
+
     def update_stockfish(self):
         """Update the stockfish panel"""
-        if (self.show_stockfish and
-                "pscore" in self.game.info[self.halfmove]):
+        info = self.game.get_info(self.halfmove)
+        if self.show_stockfish and "pscore" in info:
             self.stock_buffer.set_text(
                 ("Score: {pscore:.1f} ({score})\n" +
                  "Depth: {depth} ({seconds:.1f} sec)\n" +
-                 "PV   : {pv}").format(
-                     **self.game.info[self.halfmove]))
+                 "PV   : {pv}").format(**info))
         else:
             self.stock_buffer.set_text("")
 
@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*-coding: utf-8-*-
+
+"""Read and write games in PGN"""
+
+from __future__ import (division, absolute_import, unicode_literals,
+                        print_function)
+
+import io
+import re
+import os
+import mmap
+import time
+import logging
+import threading
+import collections
+try:
+    import queue
+except ImportError:
+    import Queue as queue  # python2
+
+from .game import Game, Position, fen_to_style12
+from .exceptions import PyficsError
+from . import config
+
+logger = logging.getLogger(__name__)
+
+TAG_REGEX = re.compile(r'\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]')
+# comments, variations, nags, move numbers, results and moves
+TOKEN_REGEX = re.compile(
+    r"\{[^}]*\}|;[^\n]*|\$\d+|[()]|1-0|0-1|1/2-1/2|\*|\d+\.+|[^\s{}();$]+")
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+ROSTER = ("Event", "Site", "Date", "Round", "White", "Black", "Result")
+LINE_WIDTH = 79
+
+
+def read_lines(filename):
+    """Yield the lines of a file, through mmap if possible"""
+    with io.open(filename, "rb") as pgn_file:
+        if os.fstat(pgn_file.fileno()).st_size == 0:
+            return
+        try:
+            data = mmap.mmap(pgn_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, mmap.error):
+            data = None
+        lines = pgn_file if data is None else iter(data.readline, b"")
+        try:
+            for line in lines:
+                yield line.decode("utf-8", "replace")
+        finally:
+            if data is not None:
+                data.close()
+
+
+def split_games(lines):
+    """Yield the tags and the movetext of every game in lines"""
+    tags = collections.OrderedDict()
+    movetext = []
+    for line in lines:
+        line = line.strip()
+        if line.startswith("["):
+            if movetext:
+                yield tags, " ".join(movetext)
+                tags = collections.OrderedDict()
+                movetext = []
+            match = TAG_REGEX.match(line)
+            if match:
+                tags[match.group(1)] = match.group(2).replace('\\"', '"')
+        elif line and not line.startswith("%"):
+            movetext.append(line)
+    if tags or movetext:
+        yield tags, " ".join(movetext)
+
+
+def parse_game(tags, movetext):
+    """Create a Game from the pgn tags and movetext"""
+    game = Game()
+    if tags.get("SetUp") == "1" and "FEN" in tags:
+        game.setup(fen_to_style12(tags["FEN"]))
+    game.tags.update(tags)
+
+    depth = 0
+    for token in TOKEN_REGEX.findall(movetext):
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth > 0 or token[0] in "{;$" or token[-1] == ".":
+            # variations, comments, nags and move numbers (castling as
+            # 0-0 starts with a digit too, but is a move)
+            continue
+        elif token in RESULTS:
+            game.tags.setdefault("Result", token)
+        else:
+            game.make_move(game.position.san_to_move(token))
+    return game
+
+
+def read_games(filename, strict=False):
+    """Yield the games in a pgn file, one at a time
+        invalid games raise a PyficsError, or are skipped and logged"""
+    for tags, movetext in split_games(read_lines(filename)):
+        try:
+            yield parse_game(tags, movetext)
+        except PyficsError as error:
+            if strict:
+                raise
+            logger.warning("Skipped game {0}: {1}".format(
+                dict(tags), error))
+
+
+def fill_tags(game, result):
+    """Set the result and the missing roster tags of a fics game,
+        from its current position"""
+    position = game.position
+    tags = game.tags
+    tags.setdefault("Event", "FICS game")
+    tags.setdefault("Site", config.SETTINGS["fics"]["server"])
+    tags.setdefault("Date", time.strftime("%Y.%m.%d"))
+    tags.setdefault("Round", "-")
+    tags.setdefault("White", "{0}".format(position.white_name))
+    tags.setdefault("Black", "{0}".format(position.black_name))
+    tags["Result"] = result if result in RESULTS else "*"
+    tags.setdefault("TimeControl", "{0}+{1}".format(
+        60 * position.initial_time, position.increment))
+
+
+def game_to_pgn(game):
+    """Return the pgn text of a game"""
+    tags = collections.OrderedDict((name, "?") for name in ROSTER)
+    tags["Result"] = "*"
+    tags.update(game.tags)
+
+    position = game.get_history(game.first)
+    if game.first != 0 or position.key != Position(config.START).key:
+        tags["SetUp"] = "1"
+        tags["FEN"] = position.get_fen()
+
+    tokens = []
+    for move, _key, _white_time, _black_time in game.history[1:]:
+        if move is None:
+            logger.warning("Unknown move after {0}".format(
+                position.get_fen()))
+            break
+        if position.next_color == "W" or not tokens:
+            tokens.append("{0}.{1}".format(
+                position.next_move_number,
+                "" if position.next_color == "W" else ".."))
+        tokens.append(position.get_san(move))
+        position.make_move(move)
+    tokens.append(tags["Result"])
+
+    lines = ['[{0} "{1}"]'.format(name, value.replace('"', '\\"'))
+             for name, value in tags.items()]
+    lines.append("")
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > LINE_WIDTH:
+            lines.append(line)
+            line = token
+        else:
+            line = "{0} {1}".format(line, token) if line else token
+    lines.append(line)
+    return "\n".join(lines) + "\n\n"
+
+
+class PgnWriter(object):
+    """Append games to a pgn file, writing in a background thread"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.queue = queue.Queue()
+        thread = threading.Thread(target=self.write_games)
+        thread.daemon = True  # thread dies with the program
+        thread.start()
+
+    def write(self, game):
+        """Queue a finished game"""
+        self.queue.put(game_to_pgn(game))
+
+    def write_games(self):
+        """Append the queued games to the file"""
+        while True:
+            text = self.queue.get()
+            try:
+                with io.open(self.filename, "a", encoding="utf-8") as pgn:
+                    pgn.write(text)
+            except (IOError, OSError) as error:
+                logger.error("Cannot save game: {0}".format(error))
+            self.queue.task_done()
+
+    def flush(self):
+        """Wait until the queued games are written"""
+        self.queue.join()
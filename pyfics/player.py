@@ -8,17 +8,24 @@ from __future__ import (division, absolute_import, unicode_literals,
 
 from gi.repository import Notify, Gtk, GLib
 import io
-import re
 import os
 import logging
+import threading
 
 from .game import Game, Position
+from .registry import GameRegistry
+from .dispatch import Dispatcher
 from .board import Board, Clock
 from .moves import MovesTab
 from .interface import Interface
 from .stockfish import Stockfish
 from .fics import Fics
-from . import config, tools
+from .pgn import PgnWriter, fill_tags
+from .archive import Archive
+from .positions import PositionIndex
+from .explorer import Explorer
+from .ratings import Ratings, get_control
+from . import config
 from .exceptions import PyficsError
 
 logger = logging.getLogger(__name__)
@@ -29,16 +36,28 @@ class Player(object):
 
     def __init__(self):
         Notify.init("PyFics")
-        self.game = Game()
+        self.game = Game()  # the game on the board
+        self.game_number = None  # its fics number, None until known
+        self.games = GameRegistry()  # all boards of the connection
         self.clock = Clock()
         self.board = Board(self.clock)
         self.movestab = MovesTab(self.game)
         self.interface = Interface(self.board, self.movestab)
         self.stock = Stockfish()
         self.server = Fics(self.interface.fics_buffer)
+        self.pgn = PgnWriter(config.PGN_FILE)
+        self.archive = Archive(config.ARCHIVE_FILE)
+        self.positions = PositionIndex(self.archive)
+        self.explorer = Explorer(self.archive)
+        self.merging = None  # the thread merging the index and the tree
+        self.ratings = (
+            Ratings.from_archive(self.archive, config.SETTINGS["fics"]["user"])
+            if config.SETTINGS["fics"]["user"] else None)
         self.board.update(self.game.get("board"))
 
         self.fics_game = False
+        self.dispatcher = Dispatcher.for_object(
+            self, default=self.fics_display)
 
         self.board.connect("moved_board", self.on_board_move)
         self.movestab.connect("step", self.on_step)
@@ -94,10 +113,9 @@ class Player(object):
 
     def reset(self):
         """Reset the interface"""
-        self.game.setup()
+        self.set_game(Game(), None)
         self.board.reset()
         self.board.update(self.game.get("board"))
-        self.movestab.moves_buffer.set_text("")
         self.fics_game = True
 
     def on_fics(self, _widget, data):
@@ -106,134 +124,191 @@ class Player(object):
 
     def parse_fics(self, data):
         """Parse output from fics"""
-        # pylint: disable=R0911,R0912,R0915
-        # R0912 = Too many branches
-        # R0915 = Too many statemnts
-
         logger.debug("Received: {0}".format(data))
-        cache = tools.Cache()
-
-        # username
-        if re.match("login:", data):
-            logger.debug("Send username")
-            self.server.command(config.SETTINGS["fics"]["user"], True)
-
-        # password
-        elif re.match("password:", data):
-            logger.debug("Send password")
-            self.server.command(config.SETTINGS["fics"]["password"], True)
-
-        # logged in
-        elif re.match(".*Starting FICS session", data):
-            logger.debug("Set fics parameters")
-            self.server.command("set style 12")
-            self.server.command("set bell off")
-            if config.SETTINGS["fics"]["password"] == "":
-                for cmd in config.SETTINGS["fics"]["guest_init"]:
-                    self.server.command(cmd)
-
-        # logged out
-        elif re.match(r"\W*Logging you out|\*\*\*\* Auto-logout", data):
-            logger.debug("Logging out")
-            self.server.output(data + "\n")
-            self.server.logout()
-
-        # a style12 move
-        elif cache(re.match("(<12>.*)", data, re.DOTALL)):
-            logger.debug("Style12")
-            self.fics_move(cache.output.group(1))
-
-        # a result message
-        elif cache(re.match(
-                r"{Game (?P<game_no>\d+) \((?P<players>.*)\)" +
-                " (?P<action>.+)} (?P<result>.+)", data)):
-            logger.debug("Game finished")
-            self.clock.set_info("{action} ({result})".format(
-                **cache.output.groupdict()))
+        self.dispatcher.dispatch(data)
+
+    def fics_login(self, _data, _match):
+        """Send the username"""
+        logger.debug("Send username")
+        self.server.command(config.SETTINGS["fics"]["user"], True)
+
+    def fics_password(self, _data, _match):
+        """Send the password"""
+        logger.debug("Send password")
+        self.server.command(config.SETTINGS["fics"]["password"], True)
+
+    def fics_session(self, _data, _match):
+        """Logged in, set the fics parameters"""
+        logger.debug("Set fics parameters")
+        self.server.command("set style 12")
+        self.server.command("set bell off")
+        if config.SETTINGS["fics"]["password"] == "":
+            for cmd in config.SETTINGS["fics"]["guest_init"]:
+                self.server.command(cmd)
+
+    def fics_logout(self, data, _match):
+        """Logged out"""
+        logger.debug("Logging out")
+        self.server.output(data + "\n")
+        self.server.logout()
+
+    def fics_style12(self, _data, match):
+        """A style12 move"""
+        logger.debug("Style12")
+        self.fics_move(match.group(1))
+
+    def fics_result(self, _data, match):
+        """A result message"""
+        logger.debug("Game finished")
+        info = "{action} ({result})".format(**match.groupdict())
+        game_number = int(match.group("game_no"))
+        self.games.finish(game_number)
+        # the game stays on the board, but is no longer followed
+        if game_number == self.game_number:
+            if self.fics_game:
+                self.save_game(match.group("result"))
+                info += self.get_rating_info()
+            self.clock.set_info(info)
             self.fics_game = False
             self.clock.stop()
             self.board.moves["pre"] = []
             self.board.set_attention(0)
             self.board.queue_draw()
             self.interface.show_move_buttons()
-            self.server.output("{action} ({result})\n\n".format(
-                **cache.output.groupdict()))
-
-        # stopped examing
-        elif re.match("You are no longer examining game" +
-                      " (?P<game_no>.*)", data):
-            logger.debug("Stop examine")
+        self.server.output("{action} ({result})\n\n".format(
+            **match.groupdict()))
+
+    def fics_removed(self, data, match):
+        """A game is no longer observed"""
+        logger.debug("Game removed")
+        game_number = int(match.group("game_no"))
+        self.games.finish(game_number)
+        if game_number == self.game_number:
+            # the next board is shown instead
+            self.game_number = None
             self.clock.stop()
-            self.clock.set_info("Stopped examing")
-            self.fics_game = False
+        self.server.output("%s\n" % data)
 
-        # ignore seek acceptance messages
-        elif re.match("(?P<opponent>.*) accepts your seek.", data):
-            logger.debug("Ignore")
-        elif re.match("Your seek matches", data):
-            logger.debug("Ignore")
-        elif re.match("Your seek intercepts .*'s getgame.", data):
-            logger.debug("Ignore")
-        elif re.match("Your opponent has aborted the game", data):
-            logger.debug("Ignore")
-
-        # show feedback for the flag command
-        elif re.match("Checking if really out of time", data):
-            logger.debug("Info message")
-            self.clock.set_info(data)
-        elif re.match("Opponent is not out of time, priming autoflag", data):
-            logger.debug("Info message")
-            self.clock.set_info(data)
-
-        # ignore move messages
-        elif re.match(r"Game (?P<game_no>\d*): (?P<opponent>.*)" +
-                      " moves: (?P<move>.*)", data):
-            logger.debug("Ignore")
-        # but display all other info
-        elif cache(re.match(r"Game (?P<game_no>\d*): (?P<message>.*)", data)):
-            logger.debug("Info message")
-            self.clock.set_info(cache.output.group("message"))
-
-        elif cache(re.match(
-                r"Creating: (?P<white>.*) (?P<white_rating>\(.*\))" +
-                r"(?P<black>.*) (?P<black_rating>\(.*\))" +
-                "(?P<timing>.*)\n" +
-                r"{Game (?P<game_no>\d)* .*}", data)):
-            logger.debug("Start game")
-            self.clock.set_name("W", cache.output.group("white"),
-                                cache.output.group("white_rating"))
-            self.clock.set_name("B", cache.output.group("black"),
-                                cache.output.group("black_rating"))
-            self.clock.set_timing(cache.output.group("timing"))
-            self.interface.show_game_buttons()
-            self.reset()
-            self.server.output((
-                "Creating: {white} {white_rating}" +
-                " vs. {black} {black_rating}:" +
-                " {timing}\n\n").format(**cache.output.groupdict()))
-            notification = Notify.Notification.new(
-                "New chess game",
-                ("{white} {white_rating}\n" +
-                 " vs. {black} {black_rating}\n" +
-                 "{timing}").format(**cache.output.groupdict()),
-                config.ICON)
-            notification.show()
-
-        elif re.match(r"Starting a game in examine \(scratch\) mode", data):
-            logger.debug("Start examine")
-            self.clock.set_name("B", "BLACK")
-            self.clock.set_name("W", "WHITE")
-            self.clock.set_timing("Examine mode")
-            self.reset()
-
-        elif re.match("Illegal move", data):
-            logger.debug("Info message")
-            self.clock.set_info(data)
+    def fics_unexamine(self, _data, _match):
+        """Stopped examining"""
+        logger.debug("Stop examine")
+        self.clock.stop()
+        self.clock.set_info("Stopped examing")
+        self.fics_game = False
 
-        else:
-            logger.debug("Just display")
-            # everything else
-            self.server.output("%s\n" % data)
+    @staticmethod
+    def fics_ignore(_data, _match):
+        """Seek acceptance and move messages"""
+        logger.debug("Ignore")
+
+    def fics_info(self, data, _match):
+        """Show feedback, like for the flag command"""
+        logger.debug("Info message")
+        self.clock.set_info(data)
+
+    def fics_game_info(self, _data, match):
+        """Show the other game messages"""
+        logger.debug("Info message")
+        self.clock.set_info(match.group("message"))
+
+    def fics_creating(self, _data, match):
+        """A new game starts"""
+        logger.debug("Start game")
+        self.clock.set_name("W", match.group("white"),
+                            match.group("white_rating"))
+        self.clock.set_name("B", match.group("black"),
+                            match.group("black_rating"))
+        self.clock.set_timing(match.group("timing"))
+        self.interface.show_game_buttons()
+        self.reset()
+        self.game.tags["Event"] = "FICS {0} game".format(
+            match.group("timing").strip())
+        for color in ("White", "Black"):
+            rating = match.group(color.lower() + "_rating").strip("()")
+            if rating.isdigit():
+                self.game.tags[color + "Elo"] = rating
+        self.server.output((
+            "Creating: {white} {white_rating}" +
+            " vs. {black} {black_rating}:" +
+            " {timing}\n\n").format(**match.groupdict()))
+        notification = Notify.Notification.new(
+            "New chess game",
+            ("{white} {white_rating}\n" +
+             " vs. {black} {black_rating}\n" +
+             "{timing}").format(**match.groupdict()),
+            config.ICON)
+        notification.show()
+
+    def fics_examine(self, _data, _match):
+        """Start examining"""
+        logger.debug("Start examine")
+        self.clock.set_name("B", "BLACK")
+        self.clock.set_name("W", "WHITE")
+        self.clock.set_timing("Examine mode")
+        self.reset()
+
+    def fics_display(self, data, _match):
+        """Display everything else"""
+        logger.debug("Just display")
+        self.server.output("%s\n" % data)
+
+    def save_game(self, result):
+        """Append the finished game to the pgn file"""
+        fill_tags(self.game, result)
+        self.pgn.write(self.game)
+        self.archive.append(self.game)
+        self.update_indexes()
+        if self.ratings is not None:
+            self.ratings.add(self.archive.get_header(len(self.archive) - 1))
+
+    def update_indexes(self):
+        """Add the saved games to the position index and the opening
+            tree; a merge of their delta files runs in a thread"""
+        if self.merging is not None:
+            # the games are added when the merge is done
+            return
+        stores = [self.positions, self.explorer]
+        for store in stores:
+            store.update(merge=False)
+        stores = [store for store in stores if store.needs_merge()]
+        if stores:
+            self.merging = threading.Thread(
+                target=self.merge_indexes, args=(stores,))
+            self.merging.daemon = True
+            self.merging.start()
+
+    def merge_indexes(self, stores):
+        """Merge the delta files, from the merging thread"""
+        for store in stores:
+            store.merge()
+        GLib.idle_add(self.merged)
+
+    def merged(self):
+        """The merging thread is done"""
+        self.merging.join()
+        self.merging = None
+        self.update_indexes()
+
+    def get_rating_info(self):
+        """The performance in the time control of the game"""
+        if self.ratings is None:
+            return ""
+        control = get_control(60 * self.game.get("initial_time"),
+                              self.game.get("increment"))
+        stats = self.ratings.get("control", control)
+        if stats is None:
+            return ""
+        return " {control} tpr {tpr:.0f} in {games:.0f} games".format(
+            control=control, **stats)
+
+    def show_games(self):
+        """Show how the saved games reaching the position scored
+            and the moves played in them"""
+        self.movestab.set_games(self.positions.get_scores(
+            self.game.get("key"),
+            config.SETTINGS["fics"]["user"] or None))
+        self.movestab.set_explorer(
+            self.explorer.get_moves(self.game.position))
 
     def after_move(self):
         """Redraw board after move"""
@@ -271,38 +346,62 @@ class Player(object):
             return
 
         self.game.make_move(move)
-        self.server.command(move["sf_move"])
+        self.server.command(move.fics_move)
         logger.debug("Made move: {0}".format(notation))
         self.movestab.update()
+        self.show_games()
         self.board.make_move(move)
         self.clock.switch()
         self.after_move()
 
+    def set_game(self, game, number):
+        """Show game on the board and in the moves tab"""
+        self.game = game
+        self.game_number = number
+        self.movestab.set_game(game)
+
     def fics_move(self, style12):
         """A move was received from fics"""
 
-        position = Position(style12)
-        notation = position.props["notation"]
-        if position.halfmove - 1 == self.game.get("halfmove"):
-            try:
-                move = self.game.notation_to_move(notation)
-                self.game.check_move(move)
-                self.board.make_move(move)
-                self.game.make_move(move)
-            except PyficsError as error:
-                logger.error("Cannot perform fics move {0}".format(notation))
-                logger.debug(error)
-        if (self.game.get("board") != position.board or
-                self.board.orientation != position.props["orientation"]):
-            logger.error("Updating board")
-            self.board.orientation = position.props["orientation"]
-            self.board.update(position.board)
-        self.game.set_position(position)
+        try:
+            position = Position(style12)
+        except PyficsError as error:
+            logger.error(error)
+            return
+        number = position.game_number
+        if number != self.game_number or number not in self.games:
+            if (self.game_number in self.games and
+                    self.game.get("relation") in (1, -1) and
+                    position.relation not in (1, -1)):
+                # a board in the background, the own game has priority
+                self.games.update(position)
+                return
+            game = self.games.get(number)
+            if game is None:
+                # the game prepared by reset, or a new board
+                # (also when a finished game number is used again)
+                game = self.games.add(number, (
+                    self.game if self.game_number is None and self.fics_game
+                    else None))
+            if game is not self.game:
+                self.set_game(game, number)
+                self.board.update(self.game.get("board"))
+            self.game_number = number
+        else:
+            self.games.get(number)
+        move = self.game.follow(position)
+        if move is not None:
+            self.board.make_move(move)
+        if move is None or self.board.orientation != position.orientation:
+            logger.debug("Updating board")
+            self.board.orientation = position.orientation
+            self.board.update(position.get_pieces())
         self.movestab.update()
+        self.show_games()
 
-        self.clock.set_seconds("W", position.props["white_time"])
-        self.clock.set_seconds("B", position.props["black_time"])
-        self.clock.start(position.props["next_color"])
+        self.clock.set_seconds("W", position.white_time)
+        self.clock.set_seconds("B", position.black_time)
+        self.clock.start(position.next_color)
 
         if self.board.moves["pre"] != []:
             # remove premoves and send them as clicks from the board
@@ -318,18 +417,17 @@ class Player(object):
             return
         for stocktime in [1000 * 2 ** i for i in range(10)]:
             for halfmove in reversed(self.game.get_halfmoves()):
-                info = self.game.info[halfmove]
+                info = self.game.get_info(halfmove)
                 if "time" in info and info["time"] > stocktime:
                     # the previous analyses is beter
                     continue
                 if "score" in info and "mate" in info["score"]:
                     # a mate was already found
                     continue
-                all_moves = [self.game.moves[gamemove]
-                             for gamemove in self.game.get_halfmoves()
-                             if gamemove <= halfmove and gamemove > 0]
                 self.stock.search(
-                    halfmove, moves=all_moves, stocktime=stocktime)
+                    halfmove, moves=self.game.get_sf_moves(halfmove),
+                    stocktime=stocktime,
+                    key=self.game.get_key(halfmove))
                 return
 
     def on_bestmove(self, _widget):
@@ -345,8 +443,8 @@ class Player(object):
         self.clock.set_info("")
         all_moves = self.game.get_halfmoves()
         halfmove = (
-            min(all_moves) if step == "start" else
-            max(all_moves) if step == "end" else
+            all_moves[0] if step == "start" else
+            all_moves[-1] if step == "end" else
             self.game.get("halfmove") - 1 if step == "back" else
             self.game.get("halfmove") + 1 if step == "forward" else
             step)
@@ -354,7 +452,7 @@ class Player(object):
             return
 
         position = self.game.get_history(halfmove)
-        notation = position.props["notation"]
+        notation = position.notation
         if halfmove - 1 in all_moves:
             self.game.position = self.game.get_history(halfmove - 1)
             self.board.update(self.game.get("board"))
@@ -367,9 +465,10 @@ class Player(object):
 
         self.clock.set_seconds("W", self.game.get("white_time"))
         self.clock.set_seconds("B", self.game.get("black_time"))
-        self.clock.active = position.props["next_color"]
+        self.clock.active = position.next_color
         self.clock.update_clocks()
         self.movestab.highlight_move(halfmove)
+        self.show_games()
         self.board.queue_draw()
         # self.analyse()
 
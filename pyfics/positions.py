@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*-coding: utf-8-*-
+
+"""Index from the zobrist key of a position to the games reaching it
+
+    the index is a ColumnStore of the columns key, game and ply, so a
+    lookup is a binary search in the memory mapped keys. The delta
+    records are merged by inserting them after the equal keys. A second
+    file holds the result and the players of every game, so the scores
+    of a position are counted without reading the archive headers."""
+
+from __future__ import (division, absolute_import, unicode_literals,
+                        print_function)
+
+import io
+import os
+import numpy
+
+from .archive import RESULTS
+from .store import ColumnStore
+
+RECORD = numpy.dtype([("key", "<u8"), ("game", "<u4"), ("ply", "<u2")])
+# the result and the lowercase players of a game, by game number
+PLAYERS = numpy.dtype([("result", "u1"), ("white", "S17"), ("black", "S17")])
+
+
+class PositionIndex(ColumnStore):
+    """Find the (game, ply) pairs of an Archive reaching a position"""
+    RECORD = RECORD
+    DELTA = RECORD
+    SUFFIX = ".pos"
+
+    def __init__(self, archive):
+        super(PositionIndex, self).__init__(archive)
+        self.players_filename = self.filename + ".players"
+        self._players = None
+
+    def game_records(self, number):
+        """The records of every position of archive game number"""
+        keys = [position.key
+                for position, _move in self.archive.replay(number)]
+        records = numpy.zeros(len(keys), RECORD)
+        records["key"] = keys
+        records["game"] = number
+        records["ply"] = numpy.arange(len(keys))
+        return records
+
+    def sort_delta(self, delta):
+        return delta[numpy.argsort(delta["key"], kind="mergesort")]
+
+    def merge_columns(self, columns, delta):
+        # delta games come after the indexed ones, so equal keys stay
+        # sorted by game when the delta is inserted after them
+        places = numpy.searchsorted(columns["key"], delta["key"], "right")
+        for name in RECORD.names:
+            yield numpy.insert(columns[name], places, delta[name])
+
+    def find(self, key):
+        """Return the games and plies reaching the position with key"""
+        columns, start, end, delta = self.find_range(key)
+        return (
+            numpy.concatenate([columns["game"][start:end], delta["game"]]),
+            numpy.concatenate([columns["ply"][start:end], delta["ply"]]))
+
+    def update(self, merge=True):
+        added = super(PositionIndex, self).update(merge)
+        self.update_players()
+        return added
+
+    def update_players(self):
+        """Add the results and players of the new archive games"""
+        rows = (os.path.getsize(self.players_filename) // PLAYERS.itemsize
+                if os.path.exists(self.players_filename) else 0)
+        count = len(self.archive)
+        if count <= rows:
+            return
+        players = numpy.zeros(count - rows, PLAYERS)
+        for row, number in enumerate(range(rows, count)):
+            header = self.archive.get_header(number)
+            players[row] = (RESULTS.index(header["Result"]),
+                            header["White"].lower().encode("utf-8")[:17],
+                            header["Black"].lower().encode("utf-8")[:17])
+        with io.open(self.players_filename, "ab") as players_file:
+            players_file.write(players.tobytes())
+        self._players = None
+
+    def get_players(self):
+        """The result and the players of every game, by game number"""
+        if (self._players is None or
+                len(self._players) < len(self.archive)):
+            self.update_players()
+            self._players = (
+                numpy.memmap(self.players_filename, PLAYERS, "r")
+                if os.path.exists(self.players_filename) else
+                numpy.zeros(0, PLAYERS))
+        return self._players
+
+    def get_scores(self, key, name=None):
+        """Count the results of the games reaching the position,
+            for the player name or else for white"""
+        players = self.get_players()
+        # the games without duplicates, without sorting them
+        found = numpy.zeros(len(players), bool)
+        found[self.find(key)[0]] = True
+        players = players[numpy.flatnonzero(found)]
+        if name is None:
+            white = numpy.ones(len(players), bool)
+            black = ~white
+        else:
+            name = name.lower().encode("utf-8")[:17]
+            white = players["white"] == name
+            black = ~white & (players["black"] == name)
+        result = players["result"]
+        white_win = result == RESULTS.index("1-0")
+        black_win = result == RESULTS.index("0-1")
+        return {
+            "games": int(numpy.count_nonzero(white | black)),
+            "win": int(numpy.count_nonzero(white & white_win) +
+                       numpy.count_nonzero(black & black_win)),
+            "draw": int(numpy.count_nonzero(
+                (white | black) & (result == RESULTS.index("1/2-1/2")))),
+            "loss": int(numpy.count_nonzero(white & black_win) +
+                        numpy.count_nonzero(black & white_win))}
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*-coding: utf-8-*-
+
+"""Scores and performance ratings of a player, with numpy
+
+    the games of the player are summed by group: all games, the time
+    control (lightning, blitz, standard), the opponent, the month and
+    the time control per month. The sums are built from an archive at
+    once, and a finished game only adds to the sums of its groups."""
+
+from __future__ import (division, absolute_import, unicode_literals,
+                        print_function)
+
+import collections
+import numpy
+
+# the sums kept for every group
+FIELDS = ("games", "score", "win", "draw", "loss", "opponent", "rating",
+          "expected")
+CONTROLS = ("lightning", "blitz", "standard")
+
+
+def get_control(initial, increment):
+    """Fics category of a time control in seconds"""
+    minutes = (initial + 2 / 3 * increment) / 60
+    return ("lightning" if minutes < 3 else
+            "blitz" if minutes < 15 else "standard")
+
+
+def expected_score(rating, opponent):
+    """Expected score against opponent, for numbers or arrays"""
+    return 1 / (1 + 10 ** ((numpy.asarray(opponent) -
+                            numpy.asarray(rating)) / 400))
+
+
+class Ratings(object):
+    """Rating statistics of the player name"""
+
+    def __init__(self, name):
+        self.name = name
+        self.totals = collections.defaultdict(
+            lambda: numpy.zeros(len(FIELDS)))
+
+    @staticmethod
+    def get_groups(control, opponent, month):
+        """The (kind, value) group keys of a game"""
+        return [("all", None), ("control", control), ("opponent", opponent),
+                ("month", month), ("control month", (control, month))]
+
+    def get_row(self, header):
+        """The groups and the FIELDS of an archive header, None if the
+            player did not play the game or it was unrated"""
+        name = self.name.lower()
+        if header["White"].lower() == name:
+            rating, opponent = header["WhiteElo"], header["BlackElo"]
+            opponent_name, win = header["Black"], "1-0"
+        elif header["Black"].lower() == name:
+            rating, opponent = header["BlackElo"], header["WhiteElo"]
+            opponent_name, win = header["White"], "0-1"
+        else:
+            return None
+        if not rating or not opponent or header["Result"] == "*":
+            return None
+        score = (0.5 if header["Result"] == "1/2-1/2" else
+                 1.0 if header["Result"] == win else 0.0)
+        return (self.get_groups(get_control(*header["TimeControl"]),
+                                opponent_name, header["Date"] // 100),
+                [1, score, score == 1, score == 0.5, score == 0, opponent,
+                 rating, expected_score(rating, opponent)])
+
+    def add(self, header):
+        """Add a finished game, return whether it counted"""
+        row = self.get_row(header)
+        if row is None:
+            return False
+        groups, values = row
+        for group in groups:
+            self.totals[group] += values
+        return True
+
+    @classmethod
+    def from_archive(cls, archive, name):
+        """Sum the games of name in an archive"""
+        ratings = cls(name)
+        rows = [row for row in (ratings.get_row(header)
+                                for header in archive.headers())
+                if row is not None]
+        if not rows:
+            return ratings
+        groups, values = zip(*rows)
+        values = numpy.array(values, float)
+        # sum the games of every group of a kind at once
+        for kind_groups in zip(*groups):
+            numbers = {}
+            inverse = [numbers.setdefault(group, len(numbers))
+                       for group in kind_groups]
+            sums = numpy.stack([
+                numpy.bincount(inverse, values[:, field], len(numbers))
+                for field in range(len(FIELDS))], axis=1)
+            for group, number in numbers.items():
+                ratings.totals[group] = sums[number]
+        return ratings
+
+    def get(self, kind, value=None):
+        """Statistics of a group, None without games
+            tpr is the average opponent rating + 400 * (wins - losses) /
+            games, and difference the score minus the expected score"""
+        if (kind, value) not in self.totals:
+            return None
+        stats = dict(zip(FIELDS, self.totals[kind, value]))
+        games = stats["games"]
+        stats["opponent"] /= games
+        stats["rating"] /= games
+        stats["tpr"] = (stats["opponent"] +
+                        400 * (stats["win"] - stats["loss"]) / games)
+        stats["difference"] = stats["score"] - stats["expected"]
+        return stats
+
+    def get_trend(self, control=None):
+        """Months (yyyymm) with the average rating and tpr of each month,
+            for all games or the time control"""
+        if control is None:
+            groups = sorted((kind, value) for kind, value in self.totals
+                            if kind == "month")
+        else:
+            groups = sorted((kind, value) for kind, value in self.totals
+                            if kind == "control month" and
+                            value[0] == control)
+        stats = [self.get(*group) for group in groups]
+        return (numpy.array([value if control is None else value[1]
+                             for _kind, value in groups], int),
+                numpy.array([stat["rating"] for stat in stats]),
+                numpy.array([stat["tpr"] for stat in stats]))
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*-coding: utf-8-*-
+
+"""The games followed on one fics connection, by game number
+
+    style12 lines of several boards arrive mixed on one connection;
+    every line is routed by its game number to the Game of that board,
+    which is created on its first line and keeps its history, so
+    switching between boards does not rebuild any position."""
+
+from __future__ import (division, absolute_import, unicode_literals,
+                        print_function)
+
+import logging
+import collections
+
+from .game import Game
+
+logger = logging.getLogger(__name__)
+
+MAX_GAMES = 200  # games kept before the least recent one is evicted
+
+
+class GameRegistry(object):
+    """Games by fics game number, the least recently updated first
+        finished games are removed with finish; beyond max_games the
+        least recently updated game is evicted, and with max_plies
+        every game is trimmed to its last max_plies halfmoves"""
+
+    def __init__(self, max_games=MAX_GAMES, max_plies=None):
+        self.max_games = max_games
+        self.max_plies = max_plies
+        self.games = collections.OrderedDict()  # game number -> Game
+
+    def __len__(self):
+        return len(self.games)
+
+    def __contains__(self, number):
+        return number in self.games
+
+    def get(self, number):
+        """The Game of number, None if it is not followed"""
+        game = self.games.pop(number, None)
+        if game is not None:
+            # the most recently used game goes to the end
+            self.games[number] = game
+        return game
+
+    def add(self, number, game=None):
+        """Follow a Game (default a new one) as number, return it"""
+        game = Game() if game is None else game
+        self.games.pop(number, None)
+        self.games[number] = game
+        while len(self.games) > self.max_games:
+            evicted, _game = self.games.popitem(last=False)
+            logger.debug("Evicted game {0}".format(evicted))
+        return game
+
+    def update(self, position):
+        """Apply a style12 Position to the Game of its game number
+            return the game and the move reaching the position, None
+            for the first position of a game or a jump"""
+        game = self.get(position.game_number)
+        if game is None:
+            game = self.add(position.game_number)
+            game.setup(position.get_style12())
+            return game, None
+        move = game.follow(position)
+        if self.max_plies is not None:
+            game.trim(self.max_plies)
+        return game, move
+
+    def finish(self, number):
+        """Stop following game number, return its Game or None"""
+        return self.games.pop(number, None)
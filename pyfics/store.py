@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*-coding: utf-8-*-
+
+"""Sorted records of the games of an archive, in memory mapped columns
+
+    the file holds the number of stored games and of records, followed
+    by the columns of the records sorted by position key, so the records
+    of a position are found by a binary search in the memory mapped keys
+    and only the pages of that position are read. New games are appended
+    to an unsorted delta file, which is merged into the columns when it
+    grows beyond MERGE_SIZE records."""
+
+from __future__ import (division, absolute_import, unicode_literals,
+                        print_function)
+
+import io
+import os
+import logging
+import threading
+import numpy
+
+logger = logging.getLogger(__name__)
+
+HEADER = numpy.dtype([("games", "<u8"), ("records", "<u8")])
+MERGE_SIZE = 1 << 20
+
+
+class ColumnStore(object):
+    """Records of archive games, sorted by key
+        a subclass gives the dtypes, the records of a game, how the
+        delta is sorted and how it is merged into the columns"""
+    RECORD = None  # dtype of the sorted records, with a key
+    DELTA = None  # dtype of the delta records, with a key and a game
+    SUFFIX = None  # extension of the archive filename
+
+    def __init__(self, archive):
+        self.archive = archive
+        self.filename = archive.filename + self.SUFFIX
+        self.delta_filename = self.filename + ".new"
+        self.games = 0  # number of stored archive games
+        self._maps = None  # the columns, the sorted delta and its keys
+        self._lock = threading.Lock()  # a merge can run in a thread
+
+    def close(self):
+        """Release the memory maps"""
+        self._maps = None
+
+    def _open(self):
+        """Map the columns and read the delta, after they were changed
+            return the columns, the sorted delta and its keys"""
+        with self._lock:
+            if self._maps is None:
+                self._maps = self._read()
+            return self._maps
+
+    def _read(self):
+        """Map the columns and read the delta"""
+        games, records = 0, 0
+        if os.path.exists(self.filename):
+            header = numpy.fromfile(self.filename, HEADER, 1)[0]
+            games, records = int(header["games"]), int(header["records"])
+        offset = HEADER.itemsize
+        columns = {}
+        for name in self.RECORD.names:
+            dtype = self.RECORD.fields[name][0]
+            columns[name] = (
+                numpy.memmap(self.filename, dtype, "r", offset, (records,))
+                if records else numpy.zeros(0, dtype))
+            offset += records * dtype.itemsize
+
+        delta = (numpy.fromfile(self.delta_filename, self.DELTA)
+                 if os.path.exists(self.delta_filename) else
+                 numpy.zeros(0, self.DELTA))
+        if len(delta):
+            games = max(games, int(delta["game"][-1]) + 1)
+        delta = self.sort_delta(delta)
+        self.games = games
+        # a contiguous copy, which searchsorted does not copy again
+        return columns, delta, numpy.ascontiguousarray(delta["key"])
+
+    def game_records(self, number):
+        """The delta records of archive game number"""
+        raise NotImplementedError
+
+    def sort_delta(self, delta):
+        """The delta records sorted by key"""
+        raise NotImplementedError
+
+    def merge_columns(self, columns, delta):
+        """Yield the merged columns, in the order of RECORD"""
+        raise NotImplementedError
+
+    def needs_merge(self):
+        """Whether the delta file grew beyond MERGE_SIZE records"""
+        return (os.path.exists(self.delta_filename) and
+                os.path.getsize(self.delta_filename) >
+                MERGE_SIZE * self.DELTA.itemsize)
+
+    def update(self, merge=True):
+        """Add the archive games added since the last update, and merge
+            the delta when it is large, unless merge is False
+            return the number of games added"""
+        self._open()
+        first, count = self.games, len(self.archive)
+        if count <= first:
+            return 0
+        with io.open(self.delta_filename, "ab") as delta_file:
+            for number in range(first, count):
+                delta_file.write(self.game_records(number).tobytes())
+        self.close()
+        if merge and self.needs_merge():
+            self.merge()
+        return count - first
+
+    def merge(self):
+        """Merge the delta file into the sorted columns
+            the store can be read while a thread merges, but it is not
+            updated until the merge is done"""
+        columns, delta, _keys = self._open()
+        header = numpy.zeros(1, HEADER)
+        header["games"] = self.games
+        temp_filename = self.filename + ".tmp"
+        with io.open(temp_filename, "wb") as store_file:
+            store_file.write(header.tobytes())
+            records = 0
+            for column in self.merge_columns(columns, delta):
+                store_file.write(numpy.ascontiguousarray(column).tobytes())
+                records = len(column)
+            header["records"] = records
+            store_file.seek(0)
+            store_file.write(header.tobytes())
+        with self._lock:
+            os.rename(temp_filename, self.filename)
+            os.remove(self.delta_filename)
+            self._maps = None
+        logger.debug("Merged {0} delta records into {1}".format(
+            len(delta), self.filename))
+
+    def find_range(self, key):
+        """The columns with the start and end of the records of key,
+            and the delta records of key"""
+        columns, delta, delta_keys = self._open()
+        key = numpy.uint64(key)
+        keys = columns["key"]
+        return (columns, numpy.searchsorted(keys, key, "left"),
+                numpy.searchsorted(keys, key, "right"),
+                delta[numpy.searchsorted(delta_keys, key, "left"):
+                      numpy.searchsorted(delta_keys, key, "right")])
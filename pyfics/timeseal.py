@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*-coding: utf-8-*-
+
+"""Timeseal protocol of fics, without any io
+
+    Timeseal turns commands into the bytes to send and received bytes
+    into messages; the caller moves the bytes over a socket, an asyncio
+    transport or a test, so the protocol does not depend on how the
+    connection is run."""
+
+from __future__ import (division, absolute_import, unicode_literals,
+                        print_function)
+
+import re
+import random
+import time
+import platform
+import getpass
+
+
+class Framer(object):
+    """Split received fics output into messages
+        a message ends at the fics% prompt or at an empty line. The scan
+        resumes where it stopped, so output arriving in many pieces is
+        scanned once, and a message is split off as soon as it ends"""
+    TERMINATOR = re.compile(b"fics%|\n\n")
+    LONGEST = len(b"fics%")
+    CONTINUATION = "\n\\   "  # a long line wrapped by the server
+
+    def __init__(self):
+        self.offset = 0  # bytes of the buffer scanned without a terminator
+
+    def get_message(self, data):
+        """The text of a message"""
+        return data.decode("iso8859").strip().replace(self.CONTINUATION, "")
+
+    def split(self, buf):
+        """Remove the complete messages from the bytearray buf,
+            return them as text"""
+        messages = []
+        start = 0
+        for match in self.TERMINATOR.finditer(buf, self.offset):
+            messages.append(self.get_message(buf[start:match.start()]))
+            start = match.end()
+        del buf[:start]
+        # the start of a terminator, completed by the next data
+        self.offset = max(len(buf) - self.LONGEST + 1, 0)
+        return messages
+
+
+class Timeseal(object):
+    """Timeseal class"""
+    ENCODE = b"Timestamp (FICS) v1.0 - programmed by Henrik Gram."
+    ENCODELEN = len(ENCODE)
+    # encode swaps these bytes of every block of 12
+    PERMUTATION = (11, 1, 9, 3, 7, 5, 6, 4, 8, 2, 10, 0)
+    # the key from any offset in ENCODE, for commands of up to 1 kB
+    KEYSTREAM = ENCODE * (1024 // ENCODELEN + 2)
+    G_RESPONSE = "\x029"
+    G_MARKER = b"\n\r[G]\n\r"  # ping of the server, answered by G_RESPONSE
+    FILLER = "1234567890abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    # telnet IAC = \xff, WONT = \xfc, WILL = \xfb, ECHO = \x01
+    IAC_WONT_ECHO = b"\xff\xfc\x01"
+    IAC_WILL_ECHO = b"\xff\xfb\x01"
+    BUFFER_SIZE = 1 << 16  # bytes read at once, unless given
+    INIT_STRING = "TIMESTAMP|{user}|{uname}|".format(
+        user=getpass.getuser(), uname=" ".join(list(platform.uname())))
+
+    def __init__(self):
+        self.connected = False  # the fics session started
+        self.writebuf = ""
+        self.buf = bytearray()  # received bytes, not consumed yet
+        self.pending = b""  # received start of a G_MARKER
+        self.framer = Framer()
+
+    def start(self):
+        """Reset for a new connection, return the bytes to send first"""
+        self.connected = False
+        self.writebuf = ""
+        del self.buf[:]
+        self.pending = b""
+        self.framer = Framer()
+        return self.write(self.INIT_STRING + "\n")
+
+    def get_buffer(self):
+        "return the buffer"
+        return self.buf.decode("iso8859")
+
+    def consume(self, size=None):
+        """Remove the first size bytes (default all) of the buffer,
+            return them as text"""
+        if size is None:
+            size = len(self.buf)
+        text = self.buf[:size].decode("iso8859")
+        # deleting at the start of a bytearray does not move the rest
+        del self.buf[:size]
+        return text
+
+    def get_messages(self):
+        """Remove the complete messages from the buffer; before the
+            session started, every line is a message"""
+        if self.connected:
+            return self.framer.split(self.buf)
+        return [line.rstrip() for line in self.consume().split("\n")]
+
+    def encode(self, text, timestamp=None, filler=None, offset=None):
+        """Encode a string into bytes
+            the timestamp, the random filler and the random offset in
+            ENCODE can be given, to get a reproducible result"""
+        if timestamp is None:
+            timestamp = int(time.time() * 1000 % 1e7)
+        enc = bytearray("{0}\x18{1:d}\x19".format(
+            text, timestamp).encode("iso8859"))
+        if filler is None:
+            filler = "".join(random.sample(self.FILLER, 12 - len(enc) % 12))
+        enc += filler.encode("iso8859")
+
+        # swap the bytes of all blocks at once, one slice per place
+        buf = bytearray(len(enc))
+        for place, source in enumerate(self.PERMUTATION):
+            buf[place::12] = enc[source::12]
+
+        if offset is None:
+            offset = random.randrange(self.ENCODELEN)
+        size = len(buf)
+        keystream = self.KEYSTREAM
+        if offset + size > len(keystream):
+            keystream = self.ENCODE * ((offset + size) // self.ENCODELEN + 1)
+        # set the high bit, xor with the key and subtract 32 of all bytes
+        # as one big integer: every byte stays >= 0x80, so nothing borrows
+        value = ((int.from_bytes(buf, "big") |
+                  int.from_bytes(b"\x80" * size, "big")) ^
+                 int.from_bytes(keystream[offset:offset + size], "big"))
+        value -= int.from_bytes(b"\x20" * size, "big")
+        return value.to_bytes(size, "big") + bytes((0x80 | offset,))
+
+    def decode(self, data):
+        """Remove the ping markers from received bytes
+            return the other bytes and the number of markers; a possible
+            start of a marker at the end is kept for the next data"""
+        if self.pending:
+            data = self.pending + data
+            self.pending = b""
+        parts = data.split(self.G_MARKER)
+        last = parts[-1]
+        # only a newline in the last len(G_MARKER) - 1 bytes can start one
+        newline = last.find(
+            b"\n", max(len(last) - len(self.G_MARKER) + 1, 0))
+        while newline != -1:
+            if self.G_MARKER.startswith(last[newline:]):
+                self.pending = last[newline:]
+                parts[-1] = last[:newline]
+                break
+            newline = last.find(b"\n", newline + 1)
+        if len(parts) == 1:
+            return parts[0], 0
+        return b"".join(parts), len(parts) - 1
+
+    def write(self, text):
+        """Append string to the writebuf, return the bytes to send
+            for the complete lines"""
+        self.writebuf += text
+        if "\n" not in self.writebuf:
+            return b""
+
+        i = self.writebuf.rfind("\n")
+        text = self.writebuf[:i]
+        self.writebuf = self.writebuf[i + 1:]
+
+        return self.encode(text) + b"\n"
+
+    def receive(self, data):
+        """Add received bytes to the buffer, return the bytes to send
+            in reply to pings"""
+        if not self.connected:
+            data = data.replace(b"\r", b"")
+            data = data.replace(self.IAC_WONT_ECHO, b"")
+            data = data.replace(self.IAC_WILL_ECHO, b"")
+            self.buf += data
+
+            if b"Starting FICS session" in self.buf:
+                self.connected = True
+            return b""
+
+        data, g_count = self.decode(data)
+        self.buf += data.replace(b"\r", b"")
+        return b"".join(self.write(self.G_RESPONSE + "\n")
+                        for _counter in range(g_count))
@@ -53,7 +53,7 @@ setup(name="pyfics",
       author_email="Sander.van.Noort@gmail.com",
       url="http://www.vnoort.info/",
       packages=["pyfics"],
-      scripts=["bin/pyfics"],
+      scripts=["bin/pyfics", "bin/pyfics-daemon"],
       data_files=(data_include("/etc/pyfics", "config") +
                   data_include("share/pyfics", "data") +
                   [("share/applications", ["pyfics.desktop"]),
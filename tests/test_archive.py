@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*-coding: utf-8-*-
+
+"""Games of an Archive, for the tags which went wrong before"""
+
+from __future__ import (division, absolute_import, unicode_literals,
+                        print_function)
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyfics.archive import Archive
+from pyfics.pgn import parse_game
+
+
+class TestArchive(unittest.TestCase):
+    """Append games and read them back"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.archive = Archive(os.path.join(self.directory, "games"))
+
+    def tearDown(self):
+        self.archive.close()
+        shutil.rmtree(self.directory)
+
+    def test_out_of_range(self):
+        """Tags out of the range of the header are clamped"""
+        game = parse_game({"White": "Alpha", "Black": "Beta",
+                           "WhiteElo": "-5", "BlackElo": "99999",
+                           "TimeControl": "-60+-2", "Result": "1-0"},
+                          "1. e4 e5 2. Qh5 Nc6 3. Bc4 Nf6 4. Qxf7# 1-0")
+        self.assertEqual(self.archive.extend([game, game]), 2)
+        self.assertEqual(len(self.archive), 2)
+        header = self.archive.get_header(1)
+        self.assertEqual((header["WhiteElo"], header["BlackElo"]),
+                         (0, 0xffff))
+        self.assertEqual(header["TimeControl"], (0, 0))
+        self.assertEqual(
+            [ply[0] for ply in self.archive.get_game(1).history],
+            [ply[0] for ply in game.history])
+
+    def test_unpacked(self):
+        """A game which cannot be packed leaves no index entry"""
+        game = parse_game({"White": "Alpha", "Black": "Beta"}, "1. d4 d5")
+        game.tags["White"] = None
+        with self.assertRaises(AttributeError):
+            self.archive.extend([game])
+        self.assertEqual(len(self.archive), 0)
+        game.tags["White"] = "Alpha"
+        self.archive.extend([game])
+        self.assertEqual(self.archive.get_header(0)["White"], "Alpha")
+
+if __name__ == "__main__":
+    unittest.main()
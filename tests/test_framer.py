@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*-coding: utf-8-*-
+
+"""The framer and the ping decoder, checked against the former ones
+    on a recorded session, cut into chunks at every byte position"""
+
+from __future__ import (division, absolute_import, unicode_literals,
+                        print_function)
+
+import os
+import re
+import random
+import unittest
+
+from pyfics.timeseal import Timeseal
+
+SESSION = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                       "data", "session.fics")
+
+
+class LegacyTimeseal(object):
+    """The former receiving side: a state machine removing the ping
+        markers from text and re.split over the whole buffer"""
+
+    def __init__(self):
+        self.connected = False
+        self.buf = ""
+        self.stateinfo = None
+        self.pings = 0
+
+    def decode(self, text):
+        """Remove the ping markers, return the text and their number"""
+        expected_table = "\n\r[G]\n\r"
+        final_state = len(expected_table)
+        g_count = 0
+        result = []
+        (state, lookahead) = self.stateinfo if self.stateinfo else (0, [])
+
+        idx = 0
+        while idx < len(text):
+            char = text[idx]
+            if char == expected_table[state]:
+                state += 1
+                if state == final_state:
+                    g_count += 1
+                    lookahead = []
+                    state = 0
+                else:
+                    lookahead.append(char)
+                idx += 1
+            elif state == 0:
+                result.append(char)
+                idx += 1
+            else:
+                result.extend(lookahead)
+                lookahead = []
+                state = 0
+
+        self.stateinfo = (state, lookahead)
+        return "".join(result), g_count
+
+    def receive(self, data):
+        """Add received bytes, return the messages"""
+        text = data.decode("iso8859")
+        if not self.connected:
+            for telnet in ("\r", "\xff\xfc\x01", "\xff\xfb\x01"):
+                text = text.replace(telnet, "")
+            self.buf += text
+            if "Starting FICS session" in self.buf:
+                self.connected = True
+        else:
+            text, g_count = self.decode(text)
+            self.pings += g_count
+            self.buf += text.replace("\r", "")
+
+        if not self.connected:
+            lines = self.buf.split("\n")
+            self.buf = ""
+            return [line.rstrip() for line in lines]
+        lines = re.split("fics%|\n\n", self.buf)
+        self.buf = lines[-1]
+        return [line.strip().replace("\n\\   ", "") for line in lines[:-1]]
+
+
+def receive_new(chunks):
+    """The messages, the ping replies and the rest of the buffer"""
+    timeseal = Timeseal()
+    messages = []
+    replies = 0
+    for chunk in chunks:
+        replies += timeseal.receive(chunk).count(b"\n")
+        messages.extend(timeseal.get_messages())
+    return (messages, replies,
+            timeseal.get_buffer() + timeseal.pending.decode("iso8859"))
+
+
+def receive_legacy(chunks):
+    """The messages, the pings and the rest of the buffer, the former way"""
+    timeseal = LegacyTimeseal()
+    messages = []
+    for chunk in chunks:
+        messages.extend(timeseal.receive(chunk))
+    # the former decoder held back a started marker in its state
+    _state, lookahead = timeseal.stateinfo or (0, [])
+    return messages, timeseal.pings, timeseal.buf + "".join(lookahead)
+
+
+class TestFramer(unittest.TestCase):
+    """Split a recorded session into the same messages as before"""
+
+    @classmethod
+    def setUpClass(cls):
+        with open(SESSION, "rb") as session_file:
+            cls.data = session_file.read()
+
+    def check(self, chunks):
+        """Compare both ways of receiving the chunks"""
+        messages, replies, rest = receive_new(chunks)
+        legacy, pings, legacy_rest = receive_legacy(chunks)
+        self.assertEqual(messages, legacy)
+        self.assertEqual(replies, pings)
+        self.assertEqual(rest, legacy_rest)
+
+    def test_whole(self):
+        """The session in one chunk, before the session started"""
+        self.check([self.data])
+
+    def test_logged_in(self):
+        """The session in one chunk after the session started"""
+        start = self.data.index(b"fics%")
+        self.check([self.data[:start], self.data[start:]])
+        messages, replies, _rest = receive_new(
+            [self.data[:start], self.data[start:]])
+        self.assertGreater(replies, 0)
+        self.assertIn("{Game 42 (Alpha vs. Beta) Beta resigns} 1-0",
+                      messages)
+        self.assertIn("GuestABCD(U)(53): a long line of chat that the " +
+                      "server wraps at the end of the line, to be joined " +
+                      "again by the framer", messages)
+
+    def test_every_cut(self):
+        """The logged in part cut in two at every byte position"""
+        start = self.data.index(b"fics%")
+        head, data = self.data[:start], self.data[start:]
+        for cut in range(len(data) + 1):
+            self.check([head, data[:cut], data[cut:]])
+
+    def test_every_login_cut(self):
+        """The session cut in two at every byte position"""
+        for cut in range(len(self.data) + 1):
+            self.check([self.data[:cut], self.data[cut:]])
+
+    def test_random_chunks(self):
+        """The session in many small chunks"""
+        rand = random.Random(20)
+        for _counter in range(200):
+            cuts = sorted(rand.sample(range(len(self.data)), 40))
+            self.check([self.data[begin:end] for begin, end in
+                        zip([0] + cuts, cuts + [len(self.data)])])
+
+if __name__ == "__main__":
+    unittest.main()
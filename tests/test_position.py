@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*-coding: utf-8-*-
+
+"""Moves of a Position, for the cases which went wrong before"""
+
+from __future__ import (division, absolute_import, unicode_literals,
+                        print_function)
+
+import unittest
+
+from pyfics.game import Position, SQUARE_INDEX, CASTLE, fen_to_style12
+from pyfics.exceptions import PyficsError
+
+
+def get_position(fen):
+    """A Position of a fen"""
+    return Position(fen_to_style12(fen))
+
+
+def board_move(position, start, end):
+    """The checked move of a board click from start to end"""
+    move = position.create_move(SQUARE_INDEX[start], SQUARE_INDEX[end])
+    position.check_move(move)
+    return move
+
+
+class TestCreateMove(unittest.TestCase):
+    """Flags of created moves"""
+
+    def test_enpassant(self):
+        """Only a pawn next to the double pushed pawn takes en passant"""
+        position = get_position("4k3/8/8/3pP3/8/8/2P5/4K3 w - d6 0 1")
+        with self.assertRaises(PyficsError):
+            board_move(position, "c2", "d6")
+        move = board_move(position, "e5", "d6")
+        self.assertEqual(move.enpassant, SQUARE_INDEX["d5"])
+
+    def test_castle(self):
+        """Only the king moves of castling castle"""
+        position = get_position("4k3/8/8/8/3K4/8/8/8 w - - 0 1")
+        with self.assertRaises(PyficsError):
+            board_move(position, "d4", "f4")
+        position = get_position("4k3/8/8/8/8/8/8/4K2R w K - 0 1")
+        self.assertTrue(board_move(position, "e1", "g1").flags & CASTLE)
+
+
+class TestSanToMove(unittest.TestCase):
+    """Pawn moves in standard algebraic notation"""
+
+    def test_pawn(self):
+        """A pawn pushes onto an empty square and takes a piece"""
+        position = get_position("4k3/8/8/3p4/4p3/8/4P3/4K3 w - - 0 1")
+        for san in ("e4", "exd3", "h8", "e8"):
+            with self.assertRaises(PyficsError):
+                position.san_to_move(san)
+        self.assertEqual(position.san_to_move("e3").end, SQUARE_INDEX["e3"])
+
+    def test_promotion(self):
+        """A pawn promotes on the last row"""
+        position = get_position("8/4P3/8/8/8/8/8/K1k5 w - - 0 1")
+        with self.assertRaises(PyficsError):
+            position.san_to_move("e8")
+        self.assertEqual(position.san_to_move("e8=Q").promotion, "Q")
+
+
+class TestProperties(unittest.TestCase):
+    """Fields set through the properties"""
+
+    def test_castling(self):
+        """A castling right changes the key, the fen and the style12"""
+        position = get_position(
+            "r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+        position.get_fen()
+        position.get_style12()
+        position.white_castle_short = 0
+        position.black_castle_long = 0
+        expected = get_position("r3k2r/8/8/8/8/8/8/R3K2R w Qk - 0 1")
+        self.assertEqual(position.key, expected.key)
+        self.assertEqual(position.get_fen(), expected.get_fen())
+        self.assertEqual(position.get_style12(), expected.get_style12())
+
+    def test_style12_field(self):
+        """A style12 field shows in the style12"""
+        position = get_position("4k3/8/8/8/8/8/8/4K3 w - - 0 1")
+        position.get_style12()
+        position.white_name = "Alpha"
+        self.assertEqual(position.get_style12().split(" ")[17], "Alpha")
+
+if __name__ == "__main__":
+    unittest.main()